@@ -1,5 +1,8 @@
+import weakref
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+
 import numpy as np
-import matplotlib.pyplot as plt
 
 # SFE-LLM Simulation: "Reality Stone"
 # 가상의 임베딩 공간에서 토큰의 궤적(Curvature)을 분석
@@ -8,6 +11,376 @@ def softmax(x):
     e_x = np.exp(x - np.max(x))
     return e_x / e_x.sum(axis=1, keepdims=True)
 
+# get_curvature_report 열 구성
+REPORT_DTYPE = np.dtype([
+    ('index', np.int64),
+    ('combined', np.float64),
+    ('first_order', np.float64),
+    ('second_order', np.float64),
+    ('trajectory', np.float64),
+    ('suppression_weight', np.float64),
+    ('suppression', np.float64),
+])
+
+def _combine_moments(parts):
+    """샤드별 (n, mean, M2) 를 합쳐 전체 (mean, std) 계산 (Chan 병렬 분산)"""
+    n, mean, m2 = parts[0]
+    for n_b, mean_b, m2_b in parts[1:]:
+        total = n + n_b
+        delta = mean_b - mean
+        mean = mean + delta * (n_b / total)
+        m2 = m2 + m2_b + delta ** 2 * (n * n_b / total)
+        n = total
+    return mean, np.sqrt(m2 / n)
+
+def rank_correlation(a, b):
+    """스피어만 순위 상관 (동순위 보정 없음)"""
+    ranks = []
+    for x in (a, b):
+        r = np.empty(len(x))
+        r[np.argsort(x, kind='stable')] = np.arange(len(x))
+        ranks.append(r - r.mean())
+    ra, rb = ranks
+    return float(np.dot(ra, rb) / np.sqrt(np.dot(ra, ra) * np.dot(rb, rb)))
+
+def _turning_curvature(dots, sq_norms, fixed_norm):
+    """
+    고정 세그먼트와 후보별 세그먼트 사이의 1 - cos theta
+    
+    Args:
+        dots: [n] 고정 세그먼트와 후보 세그먼트의 내적
+        sq_norms: [n] 후보 세그먼트의 제곱 노름
+        fixed_norm: 고정 세그먼트의 노름
+    
+    Returns:
+        ([n] 곡률, [n] 후보 세그먼트 노름), 퇴화 세그먼트는 곡률 0
+    """
+    norms = np.sqrt(np.maximum(sq_norms, 0.0))
+    valid = (norms >= 1e-9) & (fixed_norm >= 1e-9)
+    denom = np.where(valid, fixed_norm * norms, 1.0)
+    cos_theta = np.clip(dots / denom, -1.0, 1.0)
+    return np.where(valid, 1.0 - cos_theta, 0.0), norms
+
+def _segment_turn(v1, v2):
+    """연속된 두 세그먼트 사이의 1 - cos theta (퇴화 세그먼트는 0)"""
+    norm_v1 = np.linalg.norm(v1)
+    norm_v2 = np.linalg.norm(v2)
+    
+    if norm_v1 < 1e-9 or norm_v2 < 1e-9:
+        return 0.0
+    
+    cos_theta = np.dot(v1, v2) / (norm_v1 * norm_v2)
+    cos_theta = np.clip(cos_theta, -1.0, 1.0)
+    return 1.0 - cos_theta
+
+class EmbeddingIndex:
+    """
+    후보 임베딩 인덱스
+    
+    행 제곱 노름을 한 번만 계산해 두고, 문맥 벡터 사영을 행렬곱 한 번으로 처리한다.
+    EmbeddingIndex.get() 은 같은 행렬에 대해 모든 엔진/요청이 공유하는 인덱스를 돌려주며,
+    행렬이 바뀌면 (다른 객체, 모양 변경, 표본 행 변경) 다시 만든다. 표본에 걸리지 않는
+    행을 제자리에서 수정했다면 refresh() 를 호출해야 한다. 공유 캐시는 원본 행렬을
+    약한 참조로만 들고 있어, 호출자가 행렬을 버리면 파생 데이터와 함께 해제된다.
+    
+    저장 형식:
+    - float64 / float32: 그대로 BLAS 행렬곱 (np.memmap 도 가능)
+    - float16: 행 블록 단위로 float32 로 올려 계산 (전체 업캐스트 없음)
+    - quantize='int8': 행별 스케일 대칭 양자화, 블록 단위 float32 계산.
+      제곱 노름은 양자화 전 값으로 정확히 계산
+    """
+    # (id(matrix), quantize) -> (weakref(matrix), 원본을 뺀 EmbeddingIndex) (LRU)
+    _shared = OrderedDict()
+    max_shared = 4
+    n_fingerprint_rows = 64
+    block_bytes = 1 << 25  # 블록 계산 시 float32 작업 버퍼 크기
+    
+    def __init__(self, matrix, sq_norms=None, quantize=None):
+        if quantize not in (None, 'int8'):
+            raise ValueError(f"unknown quantize mode: {quantize}")
+        if not isinstance(matrix, np.ndarray):
+            matrix = np.asarray(matrix, dtype=float)
+        self.source = matrix
+        self.quantize = quantize
+        self.scales = None
+        if np.ndim(matrix) == 3:
+            # 행별 부분 인덱스 (가지치기): 작으므로 float64 로 보관
+            self.matrix = np.asarray(matrix, dtype=float)
+        elif quantize == 'int8':
+            self.matrix, self.scales, norms = self._quantize_int8(matrix)
+            sq_norms = norms if sq_norms is None else sq_norms
+        elif matrix.dtype in (np.float16, np.float32, np.float64):
+            self.matrix = matrix
+        else:
+            self.matrix = np.asarray(matrix, dtype=float)
+        if sq_norms is None:
+            sq_norms = self._row_sq_norms(self.matrix)
+        self.sq_norms = sq_norms
+        self._fingerprint = self._sample(matrix)
+    
+    @classmethod
+    def get(cls, matrix, quantize=None):
+        """공유 인덱스 조회 (없거나 행렬이 바뀌었으면 새로 생성)"""
+        if isinstance(matrix, EmbeddingIndex):
+            return matrix
+        if not isinstance(matrix, np.ndarray):
+            return cls(matrix, quantize=quantize)
+        key = (id(matrix), quantize)
+        entry = cls._shared.get(key)
+        index = None
+        if entry is not None and entry[0]() is matrix:
+            index = entry[1]._with_source(matrix)
+            if not index.is_current():
+                index = None
+        if index is None:
+            index = cls(matrix, quantize=quantize)
+            cls._share(key, index)
+        cls._shared.move_to_end(key)
+        return index
+    
+    @classmethod
+    def _share(cls, key, index):
+        # 원본은 약한 참조로만 보관 (원본이 해제되면 콜백이 항목을 지운다)
+        ref = weakref.ref(index.source, lambda r: cls._evict(key, r))
+        cls._shared[key] = (ref, index._with_source(None))
+        while len(cls._shared) > cls.max_shared:
+            cls._shared.popitem(last=False)
+    
+    @classmethod
+    def _evict(cls, key, ref):
+        entry = cls._shared.get(key)
+        if entry is not None and entry[0] is ref:
+            del cls._shared[key]
+    
+    def _with_source(self, source):
+        # 배열을 공유하는 얕은 복사본. 행렬이 원본 자체였다면 함께 바꿔 끼운다
+        out = object.__new__(type(self))
+        out.__dict__.update(self.__dict__)
+        if self.matrix is self.source:
+            out.matrix = source
+        out.source = source
+        return out
+    
+    @classmethod
+    def from_npy(cls, path, quantize=None):
+        """.npy 임베딩을 메모리 매핑으로 열어 인덱스 생성"""
+        return cls(np.load(path, mmap_mode='r'), quantize=quantize)
+    
+    def _blocks(self, n_rows, dim):
+        step = max(1, self.block_bytes // (4 * dim))
+        for start in range(0, n_rows, step):
+            yield slice(start, min(start + step, n_rows))
+    
+    def _row_sq_norms(self, matrix):
+        if matrix.ndim == 3 or matrix.dtype == np.float64:
+            return np.einsum('...j,...j->...', matrix, matrix)
+        out = np.empty(len(matrix))
+        for rows in self._blocks(*matrix.shape):
+            block = np.asarray(matrix[rows], dtype=float)
+            out[rows] = np.einsum('ij,ij->i', block, block)
+        return out
+    
+    def _quantize_int8(self, matrix):
+        q = np.empty(matrix.shape, dtype=np.int8)
+        scales = np.empty(len(matrix), dtype=np.float32)
+        norms = np.empty(len(matrix))
+        for rows in self._blocks(*matrix.shape):
+            block = np.asarray(matrix[rows], dtype=float)
+            scale = np.max(np.abs(block), axis=1) / 127.0
+            scale[scale == 0.0] = 1.0
+            q[rows] = np.clip(np.rint(block / scale[:, None]), -127, 127)
+            scales[rows] = scale
+            norms[rows] = np.einsum('ij,ij->i', block, block)
+        return q, scales, norms
+    
+    def _sample(self, matrix):
+        if np.ndim(matrix) != 2:
+            return None
+        rows = np.unique(np.linspace(0, len(matrix) - 1, self.n_fingerprint_rows).astype(int))
+        return rows, np.array(matrix[rows])
+    
+    def is_current(self):
+        """원본 행렬의 모양과 표본 행이 인덱스 생성 시점과 같은지"""
+        if self._fingerprint is None:
+            return True
+        rows, sample = self._fingerprint
+        if np.shape(self.source) != self.matrix.shape:
+            return False
+        return np.array_equal(np.asarray(self.source[rows]), sample)
+    
+    def refresh(self):
+        """원본 행렬에서 인덱스 재생성"""
+        self.__init__(self.source, quantize=self.quantize)
+        key = (id(self.source), self.quantize)
+        entry = self._shared.get(key)
+        if entry is not None and entry[0]() is self.source:
+            self._share(key, self)
+    
+    def __len__(self):
+        return self.matrix.shape[-2]
+    
+    @property
+    def shape(self):
+        return self.matrix.shape
+    
+    @property
+    def dim(self):
+        return self.matrix.shape[-1]
+    
+    @property
+    def nbytes(self):
+        """인덱스가 보관하는 배열 크기 (memmap 은 파일 크기)"""
+        extra = 0 if self.scales is None else self.scales.nbytes
+        return self.matrix.nbytes + self.sq_norms.nbytes + extra
+    
+    def project(self, vecs):
+        """
+        [terms, batch, dim] 벡터를 후보에 사영
+        
+        Returns:
+            [terms, batch, n] float64 내적 (공유 인덱스는 행렬을 한 번만 읽는다)
+        """
+        if self.matrix.ndim == 3:
+            return np.einsum('bkj,tbj->tbk', self.matrix, vecs)
+        terms, batch, dim = vecs.shape
+        q = vecs.reshape(terms * batch, dim)
+        if self.matrix.dtype in (np.float32, np.float64):
+            proj = (q.astype(self.matrix.dtype) @ self.matrix.T).astype(float, copy=False)
+        else:
+            q = q.astype(np.float32)
+            proj = np.empty((len(q), len(self.matrix)))
+            for rows in self._blocks(*self.matrix.shape):
+                proj[:, rows] = q @ self.matrix[rows].astype(np.float32).T
+            if self.scales is not None:
+                proj *= self.scales
+        return proj.reshape(terms, batch, -1)
+    
+    def rows(self, idx):
+        """idx 위치의 후보 벡터 (float64, 양자화는 복원값)"""
+        out = np.asarray(self.matrix[idx], dtype=float)
+        if self.scales is not None:
+            out *= self.scales[idx][..., None]
+        return out
+    
+    def gather(self, rows, cols):
+        """행별 (rows, cols) 후보 벡터"""
+        return self.matrix[rows, cols] if self.matrix.ndim == 3 else self.rows(cols)
+    
+    def take(self, idx):
+        """[batch, k] 인덱스의 행별 부분 인덱스 (노름 재계산 없음)"""
+        return EmbeddingIndex(self.rows(idx), self.sq_norms[idx])
+    
+    def shards(self, n):
+        """
+        행 방향 n 등분 샤드 (복사 없는 뷰)
+        
+        Returns:
+            [(행 slice, EmbeddingIndex)] 리스트
+        """
+        out = []
+        bounds = np.linspace(0, len(self), max(1, n) + 1).astype(int)
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            if stop <= start:
+                continue
+            rows = slice(start, stop)
+            shard = object.__new__(EmbeddingIndex)
+            shard.source = None
+            shard.quantize = self.quantize
+            shard.matrix = self.matrix[rows]
+            shard.sq_norms = self.sq_norms[rows]
+            shard.scales = None if self.scales is None else self.scales[rows]
+            shard._fingerprint = None
+            out.append((rows, shard))
+        return out
+
+class ContextTrajectory:
+    """
+    고정 크기 링 버퍼 문맥 궤적
+    
+    내부 꼭짓점의 방향 변화 (1 - cos theta) 합과 마지막 세그먼트 방향을 유지해
+    add() 한 번이 O(dim) 이고, 후보 토큰의 궤적 곡률은 마지막 세그먼트만 계산하면 된다.
+    """
+    def __init__(self, max_len=5):
+        self.max_len = max_len
+        self._buf = None  # [max_len, dim], 첫 add 에서 할당
+        self._start = 0
+        self._count = 0
+        self._turns = deque(maxlen=max(0, max_len - 2))  # 내부 꼭짓점별 곡률
+        self.turn_sum = 0.0
+        self.last_dir = None
+    
+    @classmethod
+    def from_vectors(cls, vectors, max_len=None):
+        traj = cls(len(vectors) if max_len is None else max_len)
+        for vec in vectors:
+            traj.add(vec)
+        return traj
+    
+    def __len__(self):
+        return self._count
+    
+    @property
+    def last(self):
+        return self._buf[(self._start + self._count - 1) % self.max_len]
+    
+    def add(self, vec):
+        vec = np.asarray(vec, dtype=float)
+        if self._buf is None:
+            self._buf = np.zeros((self.max_len, len(vec)))
+        if self._count:
+            seg = vec - self.last
+            if self._count >= 2:
+                # 누적 합 갱신: 가득 찬 deque 에서 밀려나는 꼭짓점은 빼고 새 꼭짓점을 더한다
+                if self._turns.maxlen:
+                    turn = _segment_turn(self.last_dir, seg)
+                    if len(self._turns) == self._turns.maxlen:
+                        self.turn_sum -= self._turns[0]
+                    self._turns.append(turn)
+                    self.turn_sum += turn
+            self.last_dir = seg
+        if self._count == self.max_len:
+            self._buf[self._start] = vec
+            self._start = (self._start + 1) % self.max_len
+        else:
+            self._buf[(self._start + self._count) % self.max_len] = vec
+            self._count += 1
+    
+    def clear(self):
+        self._start = 0
+        self._count = 0
+        self._turns.clear()
+        self.turn_sum = 0.0
+        self.last_dir = None
+    
+    def vectors(self):
+        """오래된 순서의 [len, dim] 배열"""
+        if not self._count:
+            return np.zeros((0, 0 if self._buf is None else self._buf.shape[1]))
+        return self.recent(self._count)
+    
+    def recent(self, n):
+        """최근 n 개 벡터 (오래된 순서), O(n * dim)"""
+        n = min(n, self._count)
+        if not n:
+            return np.zeros((0, 0 if self._buf is None else self._buf.shape[1]))
+        idx = (self._start + self._count - n + np.arange(n)) % self.max_len
+        return self._buf[idx]
+    
+    def smoothness(self, next_vec):
+        """next_vec 을 덧붙였을 때의 평균 궤적 곡률"""
+        if self._count < 2:
+            return 0.0
+        k_last = _segment_turn(self.last_dir, np.asarray(next_vec) - self.last)
+        return (self.turn_sum + k_last) / (self._count - 1)
+
+def _as_index(candidates_vecs):
+    # 2차원 행렬은 공유 인덱스, 행별 [batch, k, dim] 배열은 일회용 인덱스
+    if isinstance(candidates_vecs, EmbeddingIndex):
+        return candidates_vecs
+    if np.ndim(candidates_vecs) == 3:
+        return EmbeddingIndex(candidates_vecs)
+    return EmbeddingIndex.get(candidates_vecs)
+
 class RealityStoneEngine:
     """
     SFE 기반 환각 억제 엔진 (v2: 다중 스케일 곡률 + 적응형 억제)
@@ -17,38 +390,51 @@ class RealityStoneEngine:
     - 문맥 윈도우: 최근 N개 토큰 궤적 기반
     - 적응형 lambda: 곡률 분포에 따라 동적 조절
     - 소프트 억제: 시그모이드 기반 부드러운 전이
+    - 후보 가지치기 (optional): 원본 로짓 상위 top_k / top_p 후보만 곡률 계산
+    - 샤드 병렬 (optional): 임베딩 행을 n_shards 로 나눠 스레드 풀에서 계산
+      (BLAS 가 GIL 을 놓으므로 스레드로 충분)
     """
     def __init__(self, dimension=128, lambda_param=5.0, curvature_threshold=0.5,
-                 use_second_order=True, adaptive_lambda=True, soft_suppression=True):
+                 use_second_order=True, adaptive_lambda=True, soft_suppression=True,
+                 top_k=None, top_p=None, pruned_penalty=None, n_shards=1, n_threads=None):
         self.dim = dimension
-        self.context_history = []  # 문맥 히스토리 (최근 N개)
         self.max_history = 5
+        self.trajectory = ContextTrajectory(self.max_history)  # 문맥 히스토리 (최근 N개)
         self.curvature_threshold = curvature_threshold
         self.lambda_param = lambda_param
         self.use_second_order = use_second_order
         self.adaptive_lambda = adaptive_lambda
         self.soft_suppression = soft_suppression
+        self.top_k = top_k
+        self.top_p = top_p
+        self.pruned_penalty = pruned_penalty  # 가지치기된 후보의 고정 감점 (None 이면 그대로)
+        self.n_shards = n_shards
+        self.n_threads = n_threads or n_shards
+        self._pool = None
         
+    @property
+    def context_history(self):
+        """
+        문맥 히스토리 스냅샷 (오래된 순서의 벡터 튜플)
+
+        링 버퍼의 복사본이므로 수정해도 엔진에 반영되지 않는다 (튜플이라 append 불가).
+        벡터 추가는 add_context(), 전체 교체는 이 속성에 대입.
+        """
+        return tuple(self.trajectory.vectors())
+    
+    @context_history.setter
+    def context_history(self, vectors):
+        self.trajectory.clear()
+        for vec in vectors[-self.max_history:]:
+            self.trajectory.add(vec)
+    
     def add_context(self, vec):
-        """문맥 히스토리에 벡터 추가"""
-        self.context_history.append(vec.copy())
-        if len(self.context_history) > self.max_history:
-            self.context_history.pop(0)
+        """문맥 히스토리에 벡터 추가 (링 버퍼, 궤적 곡률 캐시 갱신)"""
+        self.trajectory.add(vec)
     
     def compute_first_order_curvature(self, prev_vec, curr_vec, next_vec):
         """1차 곡률: 방향 변화 (1 - cos theta)"""
-        v1 = curr_vec - prev_vec
-        v2 = next_vec - curr_vec
-        
-        norm_v1 = np.linalg.norm(v1)
-        norm_v2 = np.linalg.norm(v2)
-        
-        if norm_v1 < 1e-9 or norm_v2 < 1e-9:
-            return 0.0
-        
-        cos_theta = np.dot(v1, v2) / (norm_v1 * norm_v2)
-        cos_theta = np.clip(cos_theta, -1.0, 1.0)
-        return 1.0 - cos_theta
+        return _segment_turn(curr_vec - prev_vec, next_vec - curr_vec)
     
     def compute_second_order_curvature(self, prev_prev_vec, prev_vec, curr_vec, next_vec):
         """2차 곡률: 곡률의 변화율 (굴곡/가속도)"""
@@ -77,24 +463,8 @@ class RealityStoneEngine:
     
     def compute_trajectory_smoothness(self, next_vec):
         """궤적 전체의 부드러움 점수 (낮을수록 좋음)"""
-        if len(self.context_history) < 2:
-            return 0.0
-        
-        # 전체 궤적에 next_vec 추가했을 때의 총 곡률
-        trajectory = self.context_history + [next_vec]
-        total_curvature = 0.0
-        
-        for i in range(1, len(trajectory) - 1):
-            v1 = trajectory[i] - trajectory[i-1]
-            v2 = trajectory[i+1] - trajectory[i]
-            norm_v1 = np.linalg.norm(v1)
-            norm_v2 = np.linalg.norm(v2)
-            if norm_v1 > 1e-9 and norm_v2 > 1e-9:
-                cos_t = np.dot(v1, v2) / (norm_v1 * norm_v2)
-                cos_t = np.clip(cos_t, -1.0, 1.0)
-                total_curvature += 1.0 - cos_t
-        
-        return total_curvature / max(1, len(trajectory) - 2)
+        # 히스토리 구간의 곡률 합은 캐시, 후보에 의존하는 마지막 세그먼트만 계산
+        return self.trajectory.smoothness(next_vec)
     
     def compute_combined_curvature(self, prev_vec, curr_vec, next_vec, prev_prev_vec=None):
         """통합 곡률: 1차 + 2차 + 궤적 부드러움"""
@@ -118,26 +488,137 @@ class RealityStoneEngine:
         x = steepness * (curvature - threshold)
         return 1.0 / (1.0 + np.exp(-x))
     
-    def compute_adaptive_lambda(self, curvatures):
-        """적응형 lambda: 곡률 분포 기반 동적 조절"""
-        if len(curvatures) == 0:
+    def compute_adaptive_lambda(self, curvatures, mask=None):
+        """적응형 lambda: 곡률 분포 기반 동적 조절 (mask 가 있으면 True 항목만 통계)"""
+        if np.size(curvatures) == 0:
             return self.lambda_param
         
-        mean_curv = np.mean(curvatures)
-        std_curv = np.std(curvatures) + 1e-9
+        # [batch, vocab] 입력이면 행별 lambda ([batch, 1])
+        curvatures = np.asarray(curvatures)
+        keepdims = curvatures.ndim > 1
+        where = True if mask is None else mask
+        mean_curv = np.mean(curvatures, axis=-1, keepdims=keepdims, where=where)
+        std_curv = np.std(curvatures, axis=-1, keepdims=keepdims, where=where) + 1e-9
         
+        return self._lambda_from_moments(mean_curv, std_curv)
+    
+    def _lambda_from_moments(self, mean_curv, std_curv):
         # 곡률 분포가 넓으면 (환각 후보가 많으면) lambda 증가
         # 분포가 좁으면 (대부분 비슷하면) lambda 감소
         adaptive_factor = 1.0 + std_curv / (mean_curv + 1e-9)
         return self.lambda_param * adaptive_factor
 
+    def compute_curvature_batch(self, candidates_vecs, prev_vec, curr_vec, prev_prev_vec=None):
+        """
+        전체 후보에 대한 통합 곡률 (벡터화, 단일 문맥)
+        
+        Returns:
+            (combined, k1, k2, k_traj): 각각 [vocab_size] 배열
+        """
+        prev_prev_rows = None if prev_prev_vec is None else np.asarray(prev_prev_vec)[None]
+        rows = self.compute_curvature_rows(
+            candidates_vecs, np.asarray(prev_vec)[None], np.asarray(curr_vec)[None],
+            prev_prev_rows, [self.trajectory],
+        )
+        return tuple(r[0] for r in rows)
+
+    def compute_curvature_rows(self, candidates_vecs, prev_vecs, curr_vecs,
+                               prev_prev_vecs=None, histories=None):
+        """
+        문맥 행별 통합 곡률 (벡터화)
+        
+        후보별 차분 벡터를 만들지 않고 ||c - u||^2 = ||c||^2 - 2 c.u + ||u||^2 전개를
+        사용한다. ||c||^2 는 EmbeddingIndex 에 캐시되고, 모든 항의 사영은
+        [terms * batch, dim] @ [dim, vocab] 행렬곱 한 번으로 계산된다.
+        
+        Args:
+            candidates_vecs: [vocab_size, dim] 공유 후보 임베딩 또는 EmbeddingIndex
+                ([batch, k, dim] 행별 후보도 가능, 가지치기 모드)
+            prev_vecs: [batch, dim] 행별 이전 문맥 벡터
+            curr_vecs: [batch, dim] 행별 현재 문맥 벡터
+            prev_prev_vecs: [batch, dim] 행별 이전이전 문맥 벡터 (optional)
+            histories: 행별 문맥 히스토리 (길이 batch, 각 행은 ContextTrajectory
+                또는 벡터 시퀀스). None 이면 모든 행이 self.trajectory 를 공유
+        
+        Returns:
+            (combined, k1, k2, k_traj): 각각 [batch, vocab_size] (또는 [batch, k]) 배열
+        """
+        index = _as_index(candidates_vecs)
+        prev_vecs = np.atleast_2d(np.asarray(prev_vecs, dtype=float))
+        curr_vecs = np.atleast_2d(np.asarray(curr_vecs, dtype=float))
+        batch = len(curr_vecs)
+        if histories is None:
+            histories = [self.trajectory] * batch
+        histories = [
+            h if isinstance(h, ContextTrajectory) else ContextTrajectory.from_vectors(h)
+            for h in histories
+        ]
+        if len(histories) != batch or len(prev_vecs) != batch:
+            raise ValueError("prev_vecs, curr_vecs, histories must share the batch size")
+        
+        # 각 항은 (기준점 u, 고정 세그먼트 d) 쌍: 후보 세그먼트는 c - u
+        v_curr = curr_vecs - prev_vecs
+        anchors = [curr_vecs]
+        dirs = [v_curr]
+        use_k2 = self.use_second_order and prev_prev_vecs is not None
+        if use_k2:
+            # a2 = (c - curr) - v_curr = c - (curr + v_curr)
+            prev_prev_vecs = np.atleast_2d(np.asarray(prev_prev_vecs, dtype=float))
+            anchors.append(curr_vecs + v_curr)
+            dirs.append(v_curr - (prev_vecs - prev_prev_vecs))
+        has_traj = np.array([len(h) >= 2 for h in histories])
+        use_traj = bool(np.any(has_traj))
+        if use_traj:
+            # 궤적 마지막 세그먼트만 후보에 의존, 나머지는 캐시된 합
+            last = np.zeros_like(curr_vecs)
+            last_dir = np.zeros_like(curr_vecs)
+            fixed = np.zeros(batch)
+            for r in np.flatnonzero(has_traj):
+                h = histories[r]
+                last[r] = h.last
+                last_dir[r] = h.last_dir
+                fixed[r] = h.turn_sum
+            anchors.append(last)
+            dirs.append(last_dir)
+        
+        sq_norms = index.sq_norms
+        proj = index.project(np.stack(anchors + dirs))
+        n_terms = len(anchors)
+        terms = []
+        for j, (u, d) in enumerate(zip(anchors, dirs)):
+            proj_u, proj_d = proj[j], proj[n_terms + j]
+            u_sq = np.einsum('ij,ij->i', u, u)[:, None]
+            dots = proj_d - np.einsum('ij,ij->i', u, d)[:, None]
+            sq = sq_norms - 2.0 * proj_u + u_sq
+            # c ~= u 인 후보는 전개식이 상쇄로 부정확하므로 차분으로 직접 계산
+            rows, cols = np.nonzero(sq < 1e-4 * (sq_norms + u_sq))
+            if len(rows):
+                diff = index.gather(rows, cols) - u[rows]
+                sq[rows, cols] = np.einsum('ij,ij->i', diff, diff)
+                dots[rows, cols] = np.einsum('ij,ij->i', diff, d[rows])
+            d_norm = np.linalg.norm(d, axis=1)[:, None]
+            terms.append(_turning_curvature(dots, sq, d_norm) + (d_norm,))
+        
+        k1 = terms[0][0]
+        k2 = np.zeros_like(k1)
+        if use_k2:
+            k2_cos, norm_a2, norm_a1 = terms[1]
+            k2 = k2_cos * np.minimum(1.0, (norm_a1 + norm_a2) / 2.0)
+        k_traj = np.zeros_like(k1)
+        if use_traj:
+            n_seg = np.array([max(1, len(h) - 1) for h in histories])[:, None]
+            k_traj = np.where(has_traj[:, None], (fixed[:, None] + terms[-1][0]) / n_seg, 0.0)
+        
+        combined = k1 * 1.0 + k2 * 0.5 + k_traj * 0.3
+        return combined, k1, k2, k_traj
+
     def apply_suppression(self, logits, candidates_vecs, prev_vec, curr_vec, prev_prev_vec=None):
         """
         환각 억제 적용
         
         Args:
             logits: [batch_size, vocab_size] 원본 로짓
-            candidates_vecs: [vocab_size, dim] 후보 토큰 임베딩
+            candidates_vecs: [vocab_size, dim] 후보 토큰 임베딩 (또는 EmbeddingIndex)
             prev_vec: 이전 문맥 벡터
             curr_vec: 현재 문맥 벡터
             prev_prev_vec: 이전이전 문맥 벡터 (2차 곡률용, optional)
@@ -145,67 +626,280 @@ class RealityStoneEngine:
         Returns:
             억제된 로짓
         """
-        batch_size, vocab_size = logits.shape
-        suppression_field = np.zeros(vocab_size)
-        curvatures = []
-        details = []
-        
-        # 1단계: 모든 후보의 곡률 계산
-        for i in range(vocab_size):
-            combined, k1, k2, k_traj = self.compute_combined_curvature(
-                prev_vec, curr_vec, candidates_vecs[i], prev_prev_vec
+        if self.top_k is not None or self.top_p is not None:
+            # 1차원 로짓은 전체 경로와 같은 [vocab] 모양으로 되돌린다
+            shape = np.shape(logits)
+            logits = np.atleast_2d(logits)
+            batch = len(logits)
+            context_rows = [
+                None if v is None else np.broadcast_to(v, (batch, len(v)))
+                for v in (prev_vec, curr_vec, prev_prev_vec)
+            ]
+            out = self._apply_pruned(
+                logits, candidates_vecs, *context_rows, [self.trajectory] * batch
             )
-            curvatures.append(combined)
-            details.append((k1, k2, k_traj))
+            return out.reshape(shape)
         
-        curvatures = np.array(curvatures)
+        return logits - self._score(candidates_vecs, prev_vec, curr_vec, prev_prev_vec)[1]
+    
+    def _score(self, candidates_vecs, prev_vec, curr_vec, prev_prev_vec=None):
+        """전체 후보 점수 (단일 문맥): ((combined, k1, k2, k_traj), 억제량)"""
+        terms, field = self._score_rows(
+            candidates_vecs, np.asarray(prev_vec)[None], np.asarray(curr_vec)[None],
+            None if prev_prev_vec is None else np.asarray(prev_prev_vec)[None],
+            [self.trajectory],
+        )
+        return tuple(t[0] for t in terms), field[0]
+    
+    def _score_rows(self, candidates_vecs, prev_vecs, curr_vecs, prev_prev_vecs=None,
+                    histories=None):
+        """전체 후보 점수 (행별 문맥): ((combined, k1, k2, k_traj), 억제량), 각 [batch, vocab]"""
+        index = _as_index(candidates_vecs)
+        if self.n_shards <= 1 or index.matrix.ndim == 3:
+            # 1단계: 모든 후보의 곡률 계산
+            terms = self.compute_curvature_rows(
+                index, prev_vecs, curr_vecs, prev_prev_vecs, histories
+            )
+            curvatures = terms[0]
+            
+            # 2단계: 적응형 lambda 계산
+            effective_lambda = self.lambda_param
+            if self.adaptive_lambda:
+                effective_lambda = self.compute_adaptive_lambda(curvatures)
+            
+            # 3단계: 억제량 계산
+            return terms, self.compute_suppression_field(curvatures, effective_lambda)
+        return self._score_sharded(index, prev_vecs, curr_vecs, prev_prev_vecs, histories)
+    
+    def _score_sharded(self, index, prev_vecs, curr_vecs, prev_prev_vecs, histories):
+        # 1단계 (샤드 병렬): 곡률 + 샤드별 (n, mean, M2)
+        # 2단계: 적응형 lambda 를 샤드 통계로 합산
+        # 3단계 (샤드 병렬): 억제량
+        if histories is not None:
+            histories = [
+                h if isinstance(h, ContextTrajectory) else ContextTrajectory.from_vectors(h)
+                for h in histories
+            ]
+        batch = len(np.atleast_2d(curr_vecs))
+        terms = np.empty((4, batch, len(index)))
+        field = np.empty((batch, len(index)))
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.n_threads)
+        
+        def curvature(job):
+            rows, shard = job
+            terms[:, :, rows] = self.compute_curvature_rows(
+                shard, prev_vecs, curr_vecs, prev_prev_vecs, histories
+            )
+            curv = terms[0, :, rows]
+            mean = curv.mean(axis=1, keepdims=True)
+            return curv.shape[1], mean, ((curv - mean) ** 2).sum(axis=1, keepdims=True)
         
-        # 2단계: 적응형 lambda 계산
+        jobs = index.shards(self.n_shards)
+        moments = list(self._pool.map(curvature, jobs))
         effective_lambda = self.lambda_param
         if self.adaptive_lambda:
-            effective_lambda = self.compute_adaptive_lambda(curvatures)
+            mean_curv, std_curv = _combine_moments(moments)
+            effective_lambda = self._lambda_from_moments(mean_curv, std_curv + 1e-9)
         
-        # 3단계: 억제량 계산
-        for i in range(vocab_size):
-            r = curvatures[i]
-            
-            if self.soft_suppression:
-                # 소프트 억제: 시그모이드 기반
-                suppression_weight = self.sigmoid_suppression(r, self.curvature_threshold)
-                suppression_field[i] = effective_lambda * suppression_weight * r
-            else:
-                # 하드 억제: threshold 초과분만
-                excess = max(0.0, r - self.curvature_threshold)
-                suppression_field[i] = effective_lambda * (excess ** 2)
-        
-        return logits - suppression_field
-    
-    def get_curvature_report(self, candidates_vecs, prev_vec, curr_vec, prev_prev_vec=None):
-        """상세 곡률 리포트 생성"""
-        report = []
-        for i in range(len(candidates_vecs)):
-            combined, k1, k2, k_traj = self.compute_combined_curvature(
-                prev_vec, curr_vec, candidates_vecs[i], prev_prev_vec
+        def suppression(job):
+            rows = job[0]
+            field[:, rows] = self.compute_suppression_field(terms[0, :, rows], effective_lambda)
+        
+        list(self._pool.map(suppression, jobs))
+        return tuple(terms), field
+    
+    def close(self):
+        """샤드 스레드 풀 종료"""
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+    
+    def apply_suppression_batch(self, logits, candidates_vecs, prev_vecs, curr_vecs,
+                                prev_prev_vecs=None, histories=None):
+        """
+        행별 문맥에 대한 환각 억제 (다중 시퀀스 디코딩용)
+        
+        Args:
+            logits: [batch, vocab_size] 원본 로짓
+            candidates_vecs: [vocab_size, dim] 후보 토큰 임베딩 (또는 EmbeddingIndex)
+            prev_vecs: [batch, dim] 행별 이전 문맥 벡터
+            curr_vecs: [batch, dim] 행별 현재 문맥 벡터
+            prev_prev_vecs: [batch, dim] 행별 이전이전 문맥 벡터 (optional)
+            histories: 행별 문맥 히스토리 (optional, compute_curvature_rows 참고)
+        
+        Returns:
+            행별로 억제된 로짓 [batch, vocab_size]
+        """
+        if self.top_k is not None or self.top_p is not None:
+            return self._apply_pruned(
+                np.atleast_2d(logits), candidates_vecs, prev_vecs, curr_vecs,
+                prev_prev_vecs, histories,
             )
-            report.append({
-                'index': i,
-                'combined': combined,
-                'first_order': k1,
-                'second_order': k2,
-                'trajectory': k_traj,
-            })
+        return logits - self._score_rows(
+            candidates_vecs, prev_vecs, curr_vecs, prev_prev_vecs, histories
+        )[1]
+    
+    def select_candidates(self, logits):
+        """
+        원본 로짓 기준 가지치기 후보 선택 (top_k 후 top_p)
+        
+        top_p 만 지정하면 어휘 전체를 정렬한다 (곡률 계산은 여전히 선택분만).
+        
+        Returns:
+            (idx, keep): [batch, k] 후보 인덱스와 유효 마스크
+        """
+        vocab = logits.shape[1]
+        k = vocab if self.top_k is None else max(1, min(self.top_k, vocab))
+        if k < vocab:
+            idx = np.argpartition(-logits, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.broadcast_to(np.arange(vocab), logits.shape)
+        keep = np.ones(idx.shape, dtype=bool)
+        if self.top_p is not None:
+            # 선택된 후보 안에서 확률 내림차순 누적합이 top_p 에 도달할 때까지 유지
+            sub = np.take_along_axis(logits, idx, axis=1)
+            order = np.argsort(-sub, axis=1, kind='stable')
+            idx = np.take_along_axis(idx, order, axis=1)
+            probs = softmax(np.take_along_axis(sub, order, axis=1))
+            keep = (np.cumsum(probs, axis=1) - probs) < self.top_p
+            n = int(keep.sum(axis=1).max())
+            idx, keep = idx[:, :n], keep[:, :n]
+        return idx, keep
+    
+    def _apply_pruned(self, logits, candidates_vecs, prev_vecs, curr_vecs,
+                      prev_prev_vecs, histories):
+        """가지치기 모드 억제: 선택 후보만 곡률/적응형 lambda 계산"""
+        idx, keep = self.select_candidates(logits)
+        curvatures = self.compute_curvature_rows(
+            _as_index(candidates_vecs).take(idx), prev_vecs, curr_vecs, prev_prev_vecs, histories
+        )[0]
+        effective_lambda = self.lambda_param
+        if self.adaptive_lambda:
+            effective_lambda = self.compute_adaptive_lambda(curvatures, keep)
+        field = self.compute_suppression_field(curvatures, effective_lambda)
+        
+        penalty = 0.0 if self.pruned_penalty is None else self.pruned_penalty
+        out = logits - penalty
+        rows = np.arange(len(logits))[:, None]
+        scored = np.take_along_axis(logits, idx, axis=1) - field
+        out[rows, idx] = np.where(keep, scored, out[rows, idx])
+        return out
+    
+    def compute_suppression_field(self, curvatures, effective_lambda):
+        """곡률 배열 -> 억제량 배열"""
+        if self.soft_suppression:
+            # 소프트 억제: 시그모이드 기반
+            suppression_weight = self.sigmoid_suppression(curvatures, self.curvature_threshold)
+            return effective_lambda * suppression_weight * curvatures
+        # 하드 억제: threshold 초과분만
+        excess = np.maximum(0.0, curvatures - self.curvature_threshold)
+        return effective_lambda * (excess ** 2)
+    
+    def compute_suppression_weight(self, curvatures):
+        """억제 가중치: 소프트는 시그모이드, 하드는 threshold 초과 여부 (0/1)"""
+        if self.soft_suppression:
+            return self.sigmoid_suppression(curvatures, self.curvature_threshold)
+        return (curvatures > self.curvature_threshold).astype(float)
+    
+    def get_curvature_report(self, candidates_vecs, prev_vec, curr_vec, prev_prev_vec=None,
+                             top_n=None):
+        """
+        상세 곡률 리포트 생성 (열 기반)
+        
+        apply_suppression 과 같은 벡터화 계산을 사용한다. 가지치기 설정과 무관하게
+        전체 후보를 점수화한다.
+        
+        Args:
+            top_n: 억제량이 큰 상위 n 개만 (억제량 내림차순), None 이면 전체 (인덱스 순)
+        
+        Returns:
+            REPORT_DTYPE 구조화 배열. report['combined'] 처럼 열 단위로 접근
+        """
+        (combined, k1, k2, k_traj), field = self._score(
+            candidates_vecs, prev_vec, curr_vec, prev_prev_vec
+        )
+        idx = np.arange(len(combined))
+        if top_n is not None and top_n < len(idx):
+            idx = np.argpartition(-field, top_n - 1)[:top_n]
+        if top_n is not None:
+            idx = idx[np.argsort(-field[idx], kind='stable')]
+        
+        report = np.empty(len(idx), dtype=REPORT_DTYPE)
+        report['index'] = idx
+        report['combined'] = combined[idx]
+        report['first_order'] = k1[idx]
+        report['second_order'] = k2[idx]
+        report['trajectory'] = k_traj[idx]
+        report['suppression_weight'] = self.compute_suppression_weight(combined[idx])
+        report['suppression'] = field[idx]
         return report
 
 
+class RealityStoneSession:
+    """
+    생성 루프용 장기 억제 세션
+    
+    엔진 설정, 임베딩 인덱스, 롤링 문맥(링 버퍼)을 소유한다. step() 은 새 문맥 벡터로
+    문맥을 한 칸 전진시키고 억제된 로짓을 돌려준다. 문맥의 마지막 세 벡터가
+    prev_prev / prev / curr 이고, 전체 버퍼가 궤적 항의 히스토리다.
+    """
+    def __init__(self, embedding_matrix, context=(), **engine_kwargs):
+        """
+        Args:
+            embedding_matrix: [vocab_size, dim] 토큰 임베딩 행렬 (또는 EmbeddingIndex)
+            context: 초기 문맥 벡터 시퀀스 (프롬프트 등, optional)
+            engine_kwargs: RealityStoneEngine 설정 (lambda_param, top_k, ...)
+        """
+        self.index = _as_index(embedding_matrix)
+        self.engine = RealityStoneEngine(dimension=self.index.dim, **engine_kwargs)
+        self.reset(context)
+    
+    def reset(self, context=()):
+        """문맥 초기화 (context 가 있으면 그 벡터들로 채움)"""
+        self.engine.trajectory.clear()
+        for vec in context:
+            self.engine.add_context(vec)
+    
+    def refresh_embeddings(self):
+        """임베딩 행렬을 제자리에서 수정한 뒤 호출"""
+        self.index.refresh()
+    
+    def step(self, logits, new_context_vec):
+        """
+        문맥 전진 + 억제
+        
+        Args:
+            logits: [batch_size, vocab_size] 원본 로짓
+            new_context_vec: 이번 단계의 문맥 벡터 (curr 가 됨)
+        
+        Returns:
+            억제된 로짓 (문맥 벡터가 2개 미만이면 원본 그대로)
+        """
+        traj = self.engine.trajectory
+        traj.add(new_context_vec)
+        if len(traj) < 2:
+            return logits
+        recent = traj.recent(3)
+        prev_prev_vec = recent[0] if len(recent) == 3 else None
+        return self.engine.apply_suppression(
+            logits, self.index, recent[-2], recent[-1], prev_prev_vec
+        )
+
+
 def apply_reality_stone(logits, embedding_matrix, prev_vec, curr_vec, 
                         prev_prev_vec=None, lambda_param=5.0, curvature_threshold=0.5,
-                        use_second_order=True, adaptive_lambda=True, soft_suppression=True):
+                        use_second_order=True, adaptive_lambda=True, soft_suppression=True,
+                        top_k=None, top_p=None, pruned_penalty=None):
     """
     SFE Reality Stone 환각 억제 적용 (v2)
     
+    호출마다 엔진을 새로 만든다. 토큰마다 호출하는 생성 루프에서는
+    RealityStoneSession 을 사용할 것.
+    
     Args:
         logits: [batch_size, vocab_size] 원본 로짓
-        embedding_matrix: [vocab_size, dim] 토큰 임베딩 행렬
+        embedding_matrix: [vocab_size, dim] 토큰 임베딩 행렬 (또는 EmbeddingIndex)
         prev_vec: 이전 문맥 벡터
         curr_vec: 현재 문맥 벡터
         prev_prev_vec: 이전이전 문맥 벡터 (2차 곡률용)
@@ -214,6 +908,9 @@ def apply_reality_stone(logits, embedding_matrix, prev_vec, curr_vec,
         use_second_order: 2차 곡률 사용 여부
         adaptive_lambda: 적응형 lambda 사용 여부
         soft_suppression: 소프트 억제 사용 여부
+        top_k: 원본 로짓 상위 k 개 후보만 곡률 계산 (None 이면 전체)
+        top_p: 누적 확률 top_p 까지의 후보만 곡률 계산 (None 이면 전체)
+        pruned_penalty: 가지치기된 후보의 고정 감점 (None 이면 그대로)
     
     Returns:
         억제된 로짓
@@ -226,10 +923,50 @@ def apply_reality_stone(logits, embedding_matrix, prev_vec, curr_vec,
         use_second_order=use_second_order,
         adaptive_lambda=adaptive_lambda,
         soft_suppression=soft_suppression,
+        top_k=top_k,
+        top_p=top_p,
+        pruned_penalty=pruned_penalty,
     )
     return engine.apply_suppression(logits, embedding_matrix, prev_vec, curr_vec, prev_prev_vec)
 
+def apply_reality_stone_batch(logits, embedding_matrix, prev_vecs, curr_vecs,
+                              prev_prev_vecs=None, histories=None, lambda_param=5.0,
+                              curvature_threshold=0.5, use_second_order=True,
+                              adaptive_lambda=True, soft_suppression=True,
+                              top_k=None, top_p=None, pruned_penalty=None):
+    """
+    SFE Reality Stone 행별 환각 억제 (배치 디코딩용)
+    
+    Args:
+        logits: [batch, vocab_size] 원본 로짓
+        embedding_matrix: [vocab_size, dim] 토큰 임베딩 행렬 (또는 EmbeddingIndex)
+        prev_vecs: [batch, dim] 행별 이전 문맥 벡터
+        curr_vecs: [batch, dim] 행별 현재 문맥 벡터
+        prev_prev_vecs: [batch, dim] 행별 이전이전 문맥 벡터 (2차 곡률용)
+        histories: 행별 문맥 히스토리 (길이 batch 의 벡터 시퀀스 리스트)
+        나머지: apply_reality_stone 과 동일
+    
+    Returns:
+        행별로 억제된 로짓 [batch, vocab_size]
+    """
+    engine = RealityStoneEngine(
+        dimension=embedding_matrix.shape[1],
+        lambda_param=lambda_param,
+        curvature_threshold=curvature_threshold,
+        use_second_order=use_second_order,
+        adaptive_lambda=adaptive_lambda,
+        soft_suppression=soft_suppression,
+        top_k=top_k,
+        top_p=top_p,
+        pruned_penalty=pruned_penalty,
+    )
+    return engine.apply_suppression_batch(
+        logits, embedding_matrix, prev_vecs, curr_vecs, prev_prev_vecs, histories
+    )
+
 def simulate_hallucination_suppression():
+    import matplotlib.pyplot as plt
+    
     print("=" * 60)
     print("SFE Reality Stone Engine v2 - Hallucination Suppression Demo")
     print("=" * 60)
@@ -343,7 +1080,7 @@ def simulate_hallucination_suppression():
     axes[0].grid(axis='y', alpha=0.3)
     
     # 오른쪽: 곡률 분석
-    curvatures = [r['combined'] for r in report]
+    curvatures = report['combined']
     colors = ['green' if c < 0.5 else 'red' for c in curvatures]
     axes[1].barh(vocab, curvatures, color=colors, alpha=0.7)
     axes[1].axvline(x=0.5, color='black', linestyle='--', label='Threshold')
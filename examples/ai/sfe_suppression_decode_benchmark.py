@@ -0,0 +1,181 @@
+import argparse
+import json
+import platform
+import time
+
+import numpy as np
+
+from sfe_hallucination_suppressor import (
+    ContextTrajectory,
+    EmbeddingIndex,
+    RealityStoneEngine,
+    RealityStoneSession,
+)
+
+# 경로별 엔진 설정. first_order 는 모든 옵션을 끈 하드 억제 경로이고,
+# 나머지는 옵션을 하나씩 켠 경로, full 은 v2 기본 설정.
+PATHS = {
+    "first_order": dict(use_second_order=False, adaptive_lambda=False, soft_suppression=False),
+    "second_order": dict(use_second_order=True, adaptive_lambda=False, soft_suppression=False),
+    "adaptive_lambda": dict(use_second_order=False, adaptive_lambda=True, soft_suppression=False),
+    "soft": dict(use_second_order=False, adaptive_lambda=False, soft_suppression=True),
+    "full": dict(use_second_order=True, adaptive_lambda=True, soft_suppression=True),
+}
+
+STORAGE = {
+    "float64": lambda emb: EmbeddingIndex(emb),
+    "float32": lambda emb: EmbeddingIndex(emb.astype(np.float32)),
+    "float16": lambda emb: EmbeddingIndex(emb.astype(np.float16)),
+    "int8": lambda emb: EmbeddingIndex(emb, quantize="int8"),
+}
+
+
+def _int_list(text):
+    return [int(v) for v in text.split(",") if v]
+
+
+def decode(index, emb, batch, seq_len, warmup, engine_kwargs, seed):
+    """
+    합성 자기회귀 루프: LM 헤드 로짓 -> 억제 -> greedy 토큰 -> 문맥 갱신.
+    억제 호출만 시간을 재며 단계별 지연(ms)을 돌려준다.
+    """
+    rng = np.random.default_rng(seed)
+    dim = emb.shape[1]
+    hidden = rng.normal(size=(batch, dim)) / np.sqrt(dim)
+    if batch == 1:
+        session = RealityStoneSession(index, **engine_kwargs)
+    else:
+        engine = RealityStoneEngine(dimension=dim, **engine_kwargs)
+        trajs = [ContextTrajectory(engine.max_history) for _ in range(batch)]
+    latencies = []
+    for step in range(warmup + seq_len):
+        unit = hidden / np.linalg.norm(hidden, axis=1, keepdims=True)
+        logits = 8.0 * (unit @ emb.T) + rng.gumbel(size=(batch, len(emb)))
+        t0 = time.perf_counter()
+        if batch == 1:
+            out = session.step(logits, hidden[0])
+        else:
+            for traj, vec in zip(trajs, hidden):
+                traj.add(vec)
+            if len(trajs[0]) >= 2:
+                recent = [t.recent(3) for t in trajs]
+                prev_prev = np.array([r[0] for r in recent]) if len(recent[0]) == 3 else None
+                out = engine.apply_suppression_batch(
+                    logits, index, np.array([r[-2] for r in recent]),
+                    np.array([r[-1] for r in recent]), prev_prev, trajs,
+                )
+            else:
+                out = logits
+        elapsed = time.perf_counter() - t0
+        if step >= warmup:
+            latencies.append(elapsed * 1.0e3)
+        token = np.argmax(out, axis=1)
+        hidden = 0.7 * hidden + 0.3 * emb[token] + 0.05 * rng.normal(size=hidden.shape) / np.sqrt(dim)
+    return np.array(latencies)
+
+
+def _result_key(r):
+    return r["storage"], r["vocab"], r["dim"], r["batch"], r["path"]
+
+
+def compare(results, baseline_path, tolerance):
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    base = {_result_key(r): r for r in baseline["results"]}
+    regressions = 0
+    unmatched = []
+    print("")
+    print("compare(storage,vocab,dim,batch,path,p50_ratio,tokens_per_s_ratio,status)")
+    for r in results:
+        b = base.get(_result_key(r))
+        if b is None:
+            unmatched.append(r)
+            continue
+        ratio = r["p50_ms"] / b["p50_ms"]
+        status = "REGRESSION" if ratio > tolerance else "ok"
+        regressions += status != "ok"
+        print(
+            f"{r['storage']},{r['vocab']},{r['dim']},{r['batch']},{r['path']},"
+            f"{ratio:.2f},{r['tokens_per_s'] / b['tokens_per_s']:.2f},{status}"
+        )
+    for r in unmatched:
+        print(f"{r['storage']},{r['vocab']},{r['dim']},{r['batch']},{r['path']},,,NO_BASELINE")
+    if len(unmatched) == len(results):
+        # 비교한 설정이 하나도 없으면 통과로 보지 않는다
+        print(f"no configuration matched baseline {baseline_path}")
+        return max(1, regressions)
+    return regressions
+
+
+def main() -> int:
+    # Reality Stone 디코드 루프 벤치마크: 설정(vocab, dim, batch) x 경로별 억제 지연
+    # 백분위와 tokens/s. --out 으로 JSON 저장, --compare 로 이전 결과와 비교.
+    p = argparse.ArgumentParser(prog="sfe_suppression_decode_benchmark")
+    p.add_argument("--vocab", default="50000")
+    p.add_argument("--dim", default="128")
+    p.add_argument("--batch", default="1,8")
+    p.add_argument("--seq-len", type=int, default=32)
+    p.add_argument("--warmup", type=int, default=3)
+    p.add_argument("--paths", default=",".join(PATHS))
+    p.add_argument("--storage", choices=tuple(STORAGE), default="float64")
+    p.add_argument("--top-k", type=int, default=None)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--out", default=None)
+    p.add_argument("--compare", default=None)
+    p.add_argument("--tolerance", type=float, default=1.2)
+    args = p.parse_args()
+
+    paths = [name for name in args.paths.split(",") if name]
+    unknown = [name for name in paths if name not in PATHS]
+    if unknown:
+        raise SystemExit(f"unknown path(s): {', '.join(unknown)}")
+
+    results = []
+    print("storage,vocab,dim,batch,path,p50_ms,p90_ms,p99_ms,mean_ms,tokens_per_s")
+    for vocab in _int_list(args.vocab):
+        for dim in _int_list(args.dim):
+            rng = np.random.default_rng(args.seed)
+            emb = rng.normal(size=(vocab, dim)) / np.sqrt(dim)
+            index = STORAGE[args.storage](emb)
+            for batch in _int_list(args.batch):
+                for name in paths:
+                    kwargs = dict(PATHS[name], top_k=args.top_k)
+                    lat = decode(index, emb, batch, args.seq_len, args.warmup, kwargs, args.seed)
+                    p50, p90, p99 = np.percentile(lat, [50, 90, 99])
+                    r = {
+                        "storage": args.storage,
+                        "vocab": vocab,
+                        "dim": dim,
+                        "batch": batch,
+                        "path": name,
+                        "seq_len": args.seq_len,
+                        "p50_ms": float(p50),
+                        "p90_ms": float(p90),
+                        "p99_ms": float(p99),
+                        "mean_ms": float(lat.mean()),
+                        "tokens_per_s": float(batch * len(lat) / (lat.sum() * 1.0e-3)),
+                    }
+                    results.append(r)
+                    print(
+                        f"{args.storage},{vocab},{dim},{batch},{name},{p50:.3f},{p90:.3f},"
+                        f"{p99:.3f},{r['mean_ms']:.3f},{r['tokens_per_s']:.1f}"
+                    )
+
+    if args.out:
+        meta = {
+            "args": vars(args),
+            "numpy": np.__version__,
+            "python": platform.python_version(),
+            "machine": platform.machine(),
+            "processor": platform.processor(),
+        }
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump({"meta": meta, "results": results}, f, indent=2)
+        print(f"out {args.out}")
+    if args.compare:
+        return 1 if compare(results, args.compare, args.tolerance) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,145 @@
+import argparse
+import asyncio
+import io
+import json
+import os
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+# sfe_suppression_service 부하 생성기: 동시 클라이언트(스트림)가 keep-alive 연결로
+# 요청을 연속 전송하고 처리량과 지연 백분위를 잰다. --target 이 없으면 서비스를
+# 비배치(max_batch=1)와 배치(--window-ms) 설정으로 각각 띄워 비교한다.
+
+SERVICE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sfe_suppression_service.py")
+
+
+def make_payloads(rng, n, vocab, dim):
+    payloads = []
+    for _ in range(n):
+        prev_prev, prev, curr = rng.normal(size=(3, dim)) / np.sqrt(dim)
+        buf = io.BytesIO()
+        np.savez(
+            buf,
+            logits=rng.normal(size=vocab),
+            prev=prev,
+            curr=curr,
+            prev_prev=prev_prev,
+            history=rng.normal(size=(4, dim)) / np.sqrt(dim),
+        )
+        payloads.append(buf.getvalue())
+    return payloads
+
+
+async def _open(target):
+    if target.startswith("unix:"):
+        return await asyncio.open_unix_connection(target[5:])
+    host, port = target.rsplit(":", 1)
+    return await asyncio.open_connection(host, int(port))
+
+
+async def _request(reader, writer, method, path, body=b"", ctype="application/x-npz"):
+    writer.write(
+        f"{method} {path} HTTP/1.1\r\nHost: localhost\r\nContent-Type: {ctype}\r\n"
+        f"Content-Length: {len(body)}\r\n\r\n".encode("latin-1") + body
+    )
+    await writer.drain()
+    status = (await reader.readline()).decode("latin-1").split(" ", 2)[1]
+    length = 0
+    while True:
+        raw = await reader.readline()
+        if raw in (b"\r\n", b"\n", b""):
+            break
+        key, value = raw.decode("latin-1").split(":", 1)
+        if key.strip().lower() == "content-length":
+            length = int(value)
+    return status, await reader.readexactly(length)
+
+
+async def _client(target, payloads, n_requests, latencies):
+    reader, writer = await _open(target)
+    try:
+        for i in range(n_requests):
+            t0 = time.perf_counter()
+            status, _ = await _request(reader, writer, "POST", "/suppress", payloads[i % len(payloads)])
+            if status != "200":
+                raise RuntimeError(f"request failed with HTTP {status}")
+            latencies.append((time.perf_counter() - t0) * 1.0e3)
+    finally:
+        writer.close()
+
+
+async def run_load(target, payloads, clients, n_requests):
+    latencies = []
+    t0 = time.perf_counter()
+    await asyncio.gather(*(_client(target, payloads, n_requests, latencies) for _ in range(clients)))
+    elapsed = time.perf_counter() - t0
+    reader, writer = await _open(target)
+    _, body = await _request(reader, writer, "GET", "/stats")
+    writer.close()
+    return np.array(latencies), elapsed, json.loads(body)
+
+
+def spawn(args, window_ms, max_batch):
+    cmd = [
+        sys.executable, SERVICE, "--port", "0", "--vocab", str(args.vocab),
+        "--dim", str(args.dim), "--seed", str(args.seed),
+        "--window-ms", str(window_ms), "--max-batch", str(max_batch),
+    ]
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, text=True)
+    line = proc.stdout.readline().strip()
+    if not line.startswith("listening http://"):
+        proc.kill()
+        raise SystemExit(f"service failed to start: {line!r}")
+    return proc, line[len("listening http://"):]
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(prog="sfe_suppression_loadgen")
+    p.add_argument("--target", default=None, help="host:port 또는 unix:경로 (없으면 직접 실행)")
+    p.add_argument("--vocab", type=int, default=50000)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--clients", type=int, default=32)
+    p.add_argument("--requests", type=int, default=20, help="클라이언트당 요청 수")
+    p.add_argument("--window-ms", type=float, default=2.0)
+    p.add_argument("--max-batch", type=int, default=64)
+    args = p.parse_args()
+
+    payloads = make_payloads(np.random.default_rng(args.seed), 8, args.vocab, args.dim)
+    modes = []
+    try:
+        if args.target:
+            modes.append(("target", args.target, None))
+        else:
+            for name, window, max_batch in (
+                ("unbatched", 0.0, 1),
+                ("batched", args.window_ms, args.max_batch),
+            ):
+                proc, target = spawn(args, window, max_batch)
+                modes.append((name, target, proc))
+
+        print("mode,clients,requests,throughput_rps,p50_ms,p99_ms,mean_batch")
+        for name, target, proc in modes:
+            lat, elapsed, stats = asyncio.run(run_load(target, payloads, args.clients, args.requests))
+            if proc is not None:
+                proc.terminate()
+                proc.wait()
+            p50, p99 = np.percentile(lat, [50, 99])
+            print(
+                f"{name},{args.clients},{len(lat)},{len(lat) / elapsed:.1f},"
+                f"{p50:.2f},{p99:.2f},{stats['mean_batch']:.1f}"
+            )
+    finally:
+        # 실행 도중 실패해도 띄운 서비스는 모두 정리
+        for _, _, proc in modes:
+            if proc is not None and proc.poll() is None:
+                proc.terminate()
+                proc.wait()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
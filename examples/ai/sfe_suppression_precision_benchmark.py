@@ -0,0 +1,64 @@
+import argparse
+import os
+import tempfile
+
+import numpy as np
+
+from sfe_hallucination_suppressor import EmbeddingIndex, rank_correlation
+from sfe_suppression_pruning_benchmark import make_steps, run_mode
+
+
+def main() -> int:
+    # 임베딩 저장 형식별 메모리와 단계당 시간, float64 대비 억제량(logits - out)의
+    # 순위 상관과 최대 오차. rho 가 --min-rho 미만이면 종료 코드 1.
+    p = argparse.ArgumentParser(prog="sfe_suppression_precision_benchmark")
+    p.add_argument("--vocab", type=int, default=50000)
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--steps", type=int, default=10)
+    p.add_argument("--signal", type=float, default=10.0)
+    p.add_argument("--min-rho", type=float, default=0.999)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    emb, steps = make_steps(rng, args.vocab, args.dim, args.steps, args.signal)
+    ref_index = EmbeddingIndex(emb)
+    ref, _ = run_mode(ref_index, steps)
+    ref_fields = [logits[0] - out for (logits, *_), out in zip(steps, ref)]
+
+    ok = True
+    print("storage,bytes,ratio,ms_per_step,rank_corr_min,max_abs_dfield,ok")
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in (np.float32, np.float16):
+            np.save(os.path.join(tmp, f"{np.dtype(dtype).name}.npy"), emb.astype(dtype))
+        modes = [
+            ("float64", lambda: ref_index),
+            ("float32", lambda: EmbeddingIndex(emb.astype(np.float32))),
+            ("float16", lambda: EmbeddingIndex(emb.astype(np.float16))),
+            ("int8", lambda: EmbeddingIndex(emb, quantize="int8")),
+            ("mmap_float32", lambda: EmbeddingIndex.from_npy(os.path.join(tmp, "float32.npy"))),
+            ("mmap_float16", lambda: EmbeddingIndex.from_npy(os.path.join(tmp, "float16.npy"))),
+            ("mmap_float16_int8", lambda: EmbeddingIndex.from_npy(
+                os.path.join(tmp, "float16.npy"), quantize="int8")),
+        ]
+        for name, build in modes:
+            index = build()
+            run_mode(index, steps[:1])  # 워밍업 (memmap 페이지 로드)
+            outs, ms = run_mode(index, steps)
+            rho, err = [], 0.0
+            for (logits, *_), out, field_ref in zip(steps, outs, ref_fields):
+                field = logits[0] - out
+                rho.append(rank_correlation(field_ref, field))
+                err = max(err, float(np.max(np.abs(field - field_ref))))
+            good = min(rho) >= args.min_rho
+            ok &= good
+            print(
+                f"{name},{index.nbytes},{ref_index.nbytes / index.nbytes:.1f},"
+                f"{ms:.2f},{min(rho):.6f},{err:.3e},{good}"
+            )
+            del index
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,254 @@
+import argparse
+import asyncio
+import io
+import json
+
+import numpy as np
+
+from sfe_hallucination_suppressor import EmbeddingIndex, RealityStoneEngine
+
+# SFE Reality Stone 억제 서비스
+# 동시 스트림의 요청을 지연 창(--window-ms) 동안 모아 apply_suppression_batch 한 번으로
+# 처리하는 asyncio 마이크로배처 + 로컬 HTTP/1.1 (TCP 또는 Unix 소켓) 엔드포인트.
+#
+#   POST /suppress  본문: npz (logits, prev, curr, [prev_prev], [history]) -> npy 로짓
+#                   또는 같은 키의 JSON -> {"logits": [...]}
+#   GET  /stats     처리한 요청/배치 수
+#   GET  /health
+
+
+class MicroBatcher:
+    """
+    요청을 지연 창 동안 모아 한 번의 배치 억제 호출로 처리
+
+    window_ms=0, max_batch=1 이면 요청마다 따로 처리 (비배치 경로).
+    """
+    def __init__(self, engine, index, window_ms=2.0, max_batch=64):
+        self.engine = engine
+        self.index = index
+        self.window = window_ms * 1.0e-3
+        self.max_batch = max_batch
+        self.n_requests = 0
+        self.n_batches = 0
+        self._queue = None
+        self._task = None
+
+    async def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def submit(self, logits, prev_vec, curr_vec, prev_prev_vec=None, history=None):
+        """요청 하나 (logits: [vocab]) -> 억제된 로짓 [vocab]"""
+        future = asyncio.get_running_loop().create_future()
+        history = () if history is None else history
+        await self._queue.put((logits, prev_vec, curr_vec, prev_prev_vec, history, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            # 계산은 실행기 스레드에서: 그동안 다음 배치가 큐에 쌓인다
+            await self._dispatch(loop, batch)
+
+    async def _dispatch(self, loop, batch):
+        # prev_prev 는 배치 전체에 있거나 없어야 하므로 유무로 나눠 호출
+        groups = {}
+        for item in batch:
+            groups.setdefault(item[3] is None, []).append(item)
+        for no_prev_prev, items in groups.items():
+            futures = [item[5] for item in items]
+            try:
+                logits = np.stack([item[0] for item in items])
+                prev_vecs = np.stack([item[1] for item in items])
+                curr_vecs = np.stack([item[2] for item in items])
+                prev_prev = None if no_prev_prev else np.stack([item[3] for item in items])
+                histories = [item[4] for item in items]
+                out = await loop.run_in_executor(
+                    None, self.engine.apply_suppression_batch,
+                    logits, self.index, prev_vecs, curr_vecs, prev_prev, histories,
+                )
+            except Exception as exc:
+                for future in futures:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.n_batches += 1
+            self.n_requests += len(items)
+            for future, row in zip(futures, out):
+                if not future.done():
+                    future.set_result(row)
+
+
+def _decode_request(content_type, body, index):
+    if content_type.startswith("application/json"):
+        data = json.loads(body)
+        binary = False
+    else:
+        with np.load(io.BytesIO(body), allow_pickle=False) as npz:
+            data = {k: npz[k] for k in npz.files}
+        binary = True
+    missing = [k for k in ("logits", "prev", "curr") if k not in data]
+    if missing:
+        raise ValueError(f"missing field(s): {', '.join(missing)}")
+    arrays = {
+        k: (None if data.get(k) is None else np.asarray(data[k], dtype=float))
+        for k in ("logits", "prev", "curr", "prev_prev", "history")
+    }
+    # 배치에 섞이기 전에 요청 단위로 모양 검사: 잘못된 요청 하나가 같은 배치의
+    # 다른 요청까지 실패시키지 않도록
+    if arrays["logits"].shape != (len(index),):
+        raise ValueError(f"logits must have shape ({len(index)},), got {arrays['logits'].shape}")
+    for k in ("prev", "curr", "prev_prev"):
+        if arrays[k] is not None and arrays[k].shape != (index.dim,):
+            raise ValueError(f"{k} must have shape ({index.dim},), got {arrays[k].shape}")
+    history = arrays["history"]
+    if history is not None and history.size and (history.ndim != 2 or history.shape[1] != index.dim):
+        raise ValueError(f"history must have shape (n, {index.dim}), got {history.shape}")
+    return arrays, binary
+
+
+def _encode_array(arr):
+    buf = io.BytesIO()
+    np.save(buf, arr, allow_pickle=False)
+    return buf.getvalue()
+
+
+class SuppressionServer:
+    """MicroBatcher 앞단의 최소 HTTP/1.1 서버 (keep-alive)"""
+    def __init__(self, batcher):
+        self.batcher = batcher
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                method, path, _ = line.decode("latin-1").split(" ", 2)
+                headers = {}
+                while True:
+                    raw = await reader.readline()
+                    if raw in (b"\r\n", b"\n", b""):
+                        break
+                    key, value = raw.decode("latin-1").split(":", 1)
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, ctype, payload = await self.route(method, path, headers, body)
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: {ctype}\r\n"
+                    f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def route(self, method, path, headers, body):
+        if method == "GET" and path == "/health":
+            return "200 OK", "application/json", b'{"ok": true}'
+        if method == "GET" and path == "/stats":
+            stats = {
+                "requests": self.batcher.n_requests,
+                "batches": self.batcher.n_batches,
+                "mean_batch": self.batcher.n_requests / max(1, self.batcher.n_batches),
+            }
+            return "200 OK", "application/json", json.dumps(stats).encode()
+        if method == "POST" and path == "/suppress":
+            try:
+                req, binary = _decode_request(headers.get("content-type", ""), body, self.batcher.index)
+                out = await self.batcher.submit(
+                    req["logits"], req["prev"], req["curr"], req["prev_prev"], req["history"]
+                )
+            except (ValueError, KeyError, OSError) as exc:
+                msg = json.dumps({"error": str(exc)}).encode()
+                return "400 Bad Request", "application/json", msg
+            except Exception as exc:
+                # 엔진 오류 (배처 future 로 전달된 것 포함) 도 응답하고 연결은 유지
+                msg = json.dumps({"error": f"{type(exc).__name__}: {exc}"}).encode()
+                return "500 Internal Server Error", "application/json", msg
+            if binary:
+                return "200 OK", "application/x-npy", _encode_array(out)
+            return "200 OK", "application/json", json.dumps({"logits": out.tolist()}).encode()
+        return "404 Not Found", "application/json", b'{"error": "not found"}'
+
+
+def build_index(args):
+    if args.embeddings:
+        return EmbeddingIndex.from_npy(args.embeddings, quantize=args.quantize)
+    rng = np.random.default_rng(args.seed)
+    emb = rng.normal(size=(args.vocab, args.dim)) / np.sqrt(args.dim)
+    return EmbeddingIndex(emb, quantize=args.quantize)
+
+
+async def serve(args):
+    index = build_index(args)
+    engine = RealityStoneEngine(
+        dimension=index.dim, top_k=args.top_k, n_shards=args.n_shards,
+    )
+    batcher = MicroBatcher(engine, index, args.window_ms, args.max_batch)
+    await batcher.start()
+    server = SuppressionServer(batcher)
+    if args.unix:
+        srv = await asyncio.start_unix_server(server.handle, path=args.unix)
+        print(f"listening unix:{args.unix}", flush=True)
+    else:
+        srv = await asyncio.start_server(server.handle, args.host, args.port)
+        port = srv.sockets[0].getsockname()[1]
+        print(f"listening http://{args.host}:{port}", flush=True)
+    try:
+        async with srv:
+            await srv.serve_forever()
+    finally:
+        await batcher.stop()
+        engine.close()
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(prog="sfe_suppression_service")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8765)
+    p.add_argument("--unix", default=None, help="Unix 소켓 경로 (지정 시 TCP 대신)")
+    p.add_argument("--embeddings", default=None, help=".npy 임베딩 (메모리 매핑)")
+    p.add_argument("--vocab", type=int, default=50000, help="합성 임베딩 크기")
+    p.add_argument("--dim", type=int, default=128)
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("--quantize", choices=("int8",), default=None)
+    p.add_argument("--window-ms", type=float, default=2.0)
+    p.add_argument("--max-batch", type=int, default=64)
+    p.add_argument("--top-k", type=int, default=None)
+    p.add_argument("--n-shards", type=int, default=1)
+    args = p.parse_args()
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,62 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from sfe_hallucination_suppressor import EmbeddingIndex, RealityStoneEngine
+
+
+def main() -> int:
+    # 샤드 스레드 수 1..N 에 대한 단일 문맥 억제 단계 시간과 확장 효율.
+    # BLAS 자체 스레드와 겹치지 않도록 OPENBLAS_NUM_THREADS=1 (또는 MKL/OMP 동일) 권장.
+    p = argparse.ArgumentParser(prog="sfe_suppression_shard_benchmark")
+    p.add_argument("--vocab", type=int, default=250000)
+    p.add_argument("--dim", type=int, default=256)
+    p.add_argument("--dtype", choices=("float32", "float64"), default="float32")
+    p.add_argument("--batch", type=int, default=1)
+    p.add_argument("--max-threads", type=int, default=os.cpu_count() or 1)
+    p.add_argument("--shards-per-thread", type=int, default=1)
+    p.add_argument("--repeats", type=int, default=10)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    dim = args.dim
+    emb = (rng.normal(size=(args.vocab, dim)) / np.sqrt(dim)).astype(args.dtype)
+    index = EmbeddingIndex(emb)
+    prev, curr, prev_prev = rng.normal(size=(3, args.batch, dim)) / np.sqrt(dim)
+    logits = rng.normal(size=(args.batch, args.vocab))
+    history = [list(rng.normal(size=(5, dim)) / np.sqrt(dim)) for _ in range(args.batch)]
+
+    threads = [1]
+    while threads[-1] * 2 <= args.max_threads:
+        threads.append(threads[-1] * 2)
+    if threads[-1] != args.max_threads:
+        threads.append(args.max_threads)
+
+    print(f"cpu_count {os.cpu_count()}")
+    print("threads,shards,ms_per_step,speedup,efficiency,max_abs_diff")
+    ref = base_ms = None
+    for n in threads:
+        engine = RealityStoneEngine(
+            dimension=dim, n_shards=n * args.shards_per_thread if n > 1 else 1, n_threads=n
+        )
+        out = engine.apply_suppression_batch(logits, index, prev, curr, prev_prev, history)
+        t0 = time.perf_counter()
+        for _ in range(args.repeats):
+            engine.apply_suppression_batch(logits, index, prev, curr, prev_prev, history)
+        ms = (time.perf_counter() - t0) * 1.0e3 / args.repeats
+        engine.close()
+        if ref is None:
+            ref, base_ms = out, ms
+        speedup = base_ms / ms
+        print(
+            f"{n},{engine.n_shards},{ms:.2f},{speedup:.2f},{speedup / n:.2f},"
+            f"{np.max(np.abs(out - ref)):.2e}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,57 +1,237 @@
 import argparse
+import hashlib
+import json
 import math
+import os
+import shutil
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from dataclasses import dataclass
+from typing import Optional, Union
 
+import numpy as np
 
-def clamp01(x: float) -> float:
-    if x < 0.0:
-        return 0.0
-    if x > 1.0:
-        return 1.0
-    return x
+ArrayLike = Union[float, np.ndarray]
+
+
+def clamp01(x: ArrayLike) -> ArrayLike:
+    return np.clip(x, 0.0, 1.0)
 
 
-def linspace(a: float, b: float, n: int) -> list[float]:
+def linspace(a: float, b: float, n: int) -> np.ndarray:
     if n <= 1:
-        return [a]
-    step = (b - a) / (n - 1)
-    return [a + i * step for i in range(n)]
+        return np.array([a], dtype=float)
+    return np.linspace(a, b, n)
 
-def logspace(a_min: float, a_max: float, n: int) -> list[float]:
+def logspace(a_min: float, a_max: float, n: int) -> np.ndarray:
     if a_min <= 0.0 or a_max <= 0.0:
         raise ValueError("a_min and a_max must be > 0")
     if n <= 1:
-        return [a_min]
-    la = math.log(a_min)
-    lb = math.log(a_max)
-    step = (lb - la) / (n - 1)
-    return [math.exp(la + i * step) for i in range(n)]
+        return np.array([a_min], dtype=float)
+    return np.exp(np.linspace(math.log(a_min), math.log(a_max), n))
 
 
-def simpson(y: list[float], x: list[float]) -> float:
-    n = len(x)
-    if n != len(y):
+def simpson(y: ArrayLike, x: ArrayLike) -> ArrayLike:
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    n = x.shape[-1]
+    if n != y.shape[-1]:
         raise ValueError("x and y length mismatch")
     if n < 2:
-        return 0.0
+        return 0.0 if y.ndim <= 1 else np.zeros(y.shape[:-1])
     if n == 2:
-        return 0.5 * (x[1] - x[0]) * (y[0] + y[1])
+        out = 0.5 * (x[1] - x[0]) * (y[..., 0] + y[..., 1])
+        return float(out) if y.ndim == 1 else out
     if n % 2 == 0:
         n -= 1
         x = x[:n]
-        y = y[:n]
-        if n < 2:
-            return 0.0
+        y = y[..., :n]
     h = (x[-1] - x[0]) / (n - 1)
-    s = y[0] + y[-1]
-    s_odd = 0.0
-    s_even = 0.0
-    for i in range(1, n - 1):
-        if i % 2 == 1:
-            s_odd += y[i]
+    s = y[..., 0] + y[..., -1]
+    s_odd = y[..., 1:-1:2].sum(axis=-1)
+    s_even = y[..., 2:-1:2].sum(axis=-1)
+    out = (h / 3.0) * (s + 4.0 * s_odd + 2.0 * s_even)
+    return float(out) if y.ndim == 1 else out
+
+
+def cumulative_simpson(y: ArrayLike, x: ArrayLike) -> np.ndarray:
+    # Running integral on a (possibly non-uniform) grid in a single pass.
+    # Each interval [x_i, x_{i+1}] integrates the quadratic through
+    # x_i, x_{i+1}, x_{i+2}; the last interval uses x_{n-3}..x_{n-1}.
+    y = np.asarray(y, dtype=float)
+    x = np.asarray(x, dtype=float)
+    n = x.shape[-1]
+    if n != y.shape[-1]:
+        raise ValueError("x and y length mismatch")
+    out = np.zeros(y.shape)
+    if n < 2:
+        return out
+    h = np.diff(x)
+    if n == 2:
+        out[..., 1] = 0.5 * h[0] * (y[..., 0] + y[..., 1])
+        return out
+
+    h1 = h[:-1]
+    h2 = h[1:]
+    hs = h1 + h2
+    w0 = 0.5 * h1 - h1 * h1 / (6.0 * hs)
+    w1 = h1 * (3.0 * hs - 2.0 * h1) / (6.0 * h2)
+    w2 = -(h1 ** 3) / (6.0 * hs * h2)
+    seg = np.empty(y.shape[:-1] + (n - 1,))
+    seg[..., :-1] = w0 * y[..., :-2] + w1 * y[..., 1:-1] + w2 * y[..., 2:]
+
+    ha = h[-2]
+    hb = h[-1]
+    hab = ha + hb
+    seg[..., -1] = (
+        (0.5 * hb - hb * hb / (6.0 * hab)) * y[..., -1]
+        + hb * (3.0 * hab - 2.0 * hb) / (6.0 * ha) * y[..., -2]
+        - (hb ** 3) / (6.0 * hab * ha) * y[..., -3]
+    )
+    np.cumsum(seg, axis=-1, out=out[..., 1:])
+    return out
+
+
+def cubic_stencil(x_grid: np.ndarray, x: ArrayLike) -> tuple[np.ndarray, np.ndarray]:
+    # Four-point Lagrange stencils on a uniform grid: for fixed query points
+    # f(x) ~= sum_k w[..., k] * f[idx[..., k]], so many curves sampled on
+    # x_grid can be read off at x without re-deriving the weights.
+    x = np.asarray(x, dtype=float)
+    n = len(x_grid)
+    if n < 4:
+        raise ValueError("need at least 4 grid points")
+    h = (x_grid[-1] - x_grid[0]) / (n - 1)
+    if np.any(x < x_grid[0]) or np.any(x > x_grid[-1]):
+        raise ValueError("query point outside the grid")
+    base = np.clip(np.floor((x - x_grid[0]) / h).astype(np.intp) - 1, 0, n - 4)
+    idx = base[..., None] + np.arange(4)
+    xs = x_grid[idx]
+    w = np.ones(idx.shape)
+    for k in range(4):
+        for j in range(4):
+            if j != k:
+                w[..., k] *= (x - xs[..., j]) / (xs[..., k] - xs[..., j])
+    return idx, w
+
+
+# Dormand-Prince 5(4) tableau with Hairer's 4th-order dense output.
+_DP_C = np.array([0.0, 1.0 / 5.0, 3.0 / 10.0, 4.0 / 5.0, 8.0 / 9.0, 1.0])
+_DP_A = [
+    np.array([]),
+    np.array([1.0 / 5.0]),
+    np.array([3.0 / 40.0, 9.0 / 40.0]),
+    np.array([44.0 / 45.0, -56.0 / 15.0, 32.0 / 9.0]),
+    np.array([19372.0 / 6561.0, -25360.0 / 2187.0, 64448.0 / 6561.0, -212.0 / 729.0]),
+    np.array([9017.0 / 3168.0, -355.0 / 33.0, 46732.0 / 5247.0, 49.0 / 176.0, -5103.0 / 18656.0]),
+]
+_DP_B = np.array([35.0 / 384.0, 0.0, 500.0 / 1113.0, 125.0 / 192.0, -2187.0 / 6784.0, 11.0 / 84.0])
+_DP_E = np.array([
+    -71.0 / 57600.0, 0.0, 71.0 / 16695.0, -71.0 / 1920.0,
+    17253.0 / 339200.0, -22.0 / 525.0, 1.0 / 40.0,
+])
+_DP_P = np.array([
+    [1.0, -8048581381.0 / 2820520608.0, 8663915743.0 / 2820520608.0, -12715105075.0 / 11282082432.0],
+    [0.0, 0.0, 0.0, 0.0],
+    [0.0, 131558114200.0 / 32700410799.0, -68118460800.0 / 10900136933.0, 87487479700.0 / 32700410799.0],
+    [0.0, -1754552775.0 / 470086768.0, 14199869525.0 / 1410260304.0, -10690763975.0 / 1880347072.0],
+    [0.0, 127303824393.0 / 49829197408.0, -318862633887.0 / 49829197408.0, 701980252875.0 / 199316789632.0],
+    [0.0, -282668133.0 / 205662961.0, 2019193451.0 / 616988883.0, -1453857185.0 / 822651844.0],
+    [0.0, 40617522.0 / 29380423.0, -110615467.0 / 29380423.0, 69997945.0 / 29380423.0],
+])
+
+
+@dataclass(frozen=True)
+class DenseSolution:
+    x: np.ndarray
+    h: np.ndarray
+    y: np.ndarray
+    q: np.ndarray
+    n_rhs: int
+
+    def __call__(self, x: ArrayLike) -> np.ndarray:
+        # y at arbitrary x inside [x[0], x[-1]]; result has shape x.shape + (dim,).
+        xq = np.asarray(x, dtype=float)
+        lo, hi = sorted((self.x[0], self.x[-1]))
+        if np.any(xq < lo - 1e-12 * abs(lo)) or np.any(xq > hi + 1e-12 * abs(hi)):
+            raise ValueError("x outside the integrated interval")
+        sign = 1.0 if self.x[-1] >= self.x[0] else -1.0
+        k = np.searchsorted(sign * self.x[1:-1], sign * xq, side="right")
+        theta = (xq - self.x[k]) / self.h[k]
+        powers = np.stack([theta, theta ** 2, theta ** 3, theta ** 4], axis=-1)
+        return self.y[k] + self.h[k][..., None] * np.einsum("...dk,...k->...d", self.q[k], powers)
+
+
+def dormand_prince(
+    rhs,
+    x0: float,
+    x1: float,
+    y0: ArrayLike,
+    rtol: float = 1.0e-8,
+    atol: float = 1.0e-12,
+    first_step: float = 0.0,
+    max_steps: int = 100000,
+) -> DenseSolution:
+    # Embedded RK45 with step-size control on the mixed rtol/atol RMS norm.
+    # Every accepted step keeps its dense-output coefficients.
+    y = np.atleast_1d(np.asarray(y0, dtype=float)).copy()
+    span = x1 - x0
+    if span == 0.0:
+        raise ValueError("empty integration interval")
+    direction = 1.0 if span > 0.0 else -1.0
+    x = x0
+    f = np.asarray(rhs(x, y), dtype=float)
+    n_rhs = 1
+    if first_step > 0.0:
+        h = first_step
+    else:
+        scale = atol + rtol * np.abs(y)
+        d0 = np.sqrt(np.mean((y / scale) ** 2))
+        d1 = np.sqrt(np.mean((f / scale) ** 2))
+        h = 0.01 * d0 / d1 if d0 > 1.0e-5 and d1 > 1.0e-5 else 1.0e-6
+    h = min(h, abs(span))
+
+    xs = [x]
+    hs = []
+    ys = [y.copy()]
+    qs = []
+    k = np.empty((7, y.size))
+    for _ in range(max_steps):
+        if direction * (x1 - x) <= 0.0:
+            break
+        h = min(h, abs(x1 - x))
+        hd = direction * h
+        k[0] = f
+        for i in range(1, 6):
+            k[i] = rhs(x + _DP_C[i] * hd, y + hd * (_DP_A[i] @ k[:i]))
+        y_new = y + hd * (_DP_B @ k[:6])
+        x_new = x + hd if h < abs(x1 - x) else x1
+        k[6] = rhs(x_new, y_new)
+        n_rhs += 6
+
+        err = hd * (_DP_E @ k)
+        scale = atol + rtol * np.maximum(np.abs(y), np.abs(y_new))
+        err_norm = float(np.sqrt(np.mean((err / scale) ** 2)))
+        if err_norm <= 1.0:
+            qs.append(k.T @ _DP_P)
+            hs.append(hd)
+            x = x_new
+            y = y_new
+            f = k[6].copy()
+            xs.append(x)
+            ys.append(y.copy())
+            factor = 10.0 if err_norm == 0.0 else min(10.0, 0.9 * err_norm ** -0.2)
         else:
-            s_even += y[i]
-    return (h / 3.0) * (s + 4.0 * s_odd + 2.0 * s_even)
+            factor = max(0.2, 0.9 * err_norm ** -0.2)
+        h *= factor
+    else:
+        raise RuntimeError("dormand_prince: max_steps exceeded")
+
+    return DenseSolution(
+        x=np.asarray(xs),
+        h=np.asarray(hs),
+        y=np.asarray(ys),
+        q=np.asarray(qs),
+        n_rhs=n_rhs,
+    )
 
 
 @dataclass(frozen=True)
@@ -59,136 +239,712 @@ class Background:
     omega_m0: float
     omega_l0: float
 
-    def e_of_a(self, a: float) -> float:
-        return math.sqrt(self.omega_m0 * a ** (-3.0) + self.omega_l0)
+    def _matter(self, a: ArrayLike) -> ArrayLike:
+        return self.omega_m0 * np.asarray(a, dtype=float) ** (-3.0)
 
-    def dlnh_dln_a(self, a: float) -> float:
-        e2 = self.omega_m0 * a ** (-3.0) + self.omega_l0
-        num = -3.0 * self.omega_m0 * a ** (-3.0)
-        return 0.5 * num / e2
+    def e_of_a(self, a: ArrayLike) -> ArrayLike:
+        return np.sqrt(self._matter(a) + self.omega_l0)
 
-    def omega_m_of_a(self, a: float) -> float:
-        e2 = self.omega_m0 * a ** (-3.0) + self.omega_l0
-        return (self.omega_m0 * a ** (-3.0)) / e2
+    def dlnh_dln_a(self, a: ArrayLike) -> ArrayLike:
+        m = self._matter(a)
+        e2 = m + self.omega_l0
+        return 0.5 * (-3.0 * m) / e2
 
-    def omega_l_of_a(self, a: float) -> float:
-        e2 = self.omega_m0 * a ** (-3.0) + self.omega_l0
-        return self.omega_l0 / e2
+    def omega_m_of_a(self, a: ArrayLike) -> ArrayLike:
+        m = self._matter(a)
+        return m / (m + self.omega_l0)
 
+    def omega_l_of_a(self, a: ArrayLike) -> ArrayLike:
+        return self.omega_l0 / (self._matter(a) + self.omega_l0)
 
-def compute_s_of_a(bg: Background, a_grid: list[float]) -> list[float]:
-    omegals = [bg.omega_l_of_a(a) for a in a_grid]
-    denom = simpson(omegals, a_grid)
-    if denom <= 0.0:
-        return [0.0 for _ in a_grid]
-    out = []
-    for i in range(len(a_grid)):
-        num = simpson(omegals[: i + 1], a_grid[: i + 1])
-        out.append(clamp01(num / denom))
-    return out
+    def distance_table(self, z_max: float, n: int = 4001) -> "DistanceTable":
+        return DistanceTable.build(self, z_max, n)
 
-def compute_s_of_a_ratio(bg: Background, a_grid: list[float]) -> list[float]:
-    omega_l0 = bg.omega_l_of_a(1.0)
-    if omega_l0 <= 0.0:
-        return [0.0 for _ in a_grid]
-    out = []
-    for a in a_grid:
-        out.append(clamp01(bg.omega_l_of_a(a) / omega_l0))
-    return out
 
+def compute_s_of_a(bg: Background, a_grid: ArrayLike) -> np.ndarray:
+    a_grid = np.asarray(a_grid, dtype=float)
+    running = cumulative_simpson(bg.omega_l_of_a(a_grid), a_grid)
+    denom = running[..., -1:]
+    ok = denom > 0.0
+    return np.where(ok, clamp01(running / np.where(ok, denom, 1.0)), 0.0)
 
-def solve_growth(bg: Background, a_grid: list[float], mu_of_a: list[float]) -> tuple[list[float], list[float]]:
-    if len(a_grid) != len(mu_of_a):
+def compute_s_of_a_ratio(bg: Background, a_grid: ArrayLike) -> np.ndarray:
+    a_grid = np.asarray(a_grid, dtype=float)
+    omega_l0 = np.asarray(bg.omega_l_of_a(1.0))
+    ok = omega_l0 > 0.0
+    ratio = bg.omega_l_of_a(a_grid) / np.where(ok, omega_l0, 1.0)
+    return np.where(ok, clamp01(ratio), 0.0)
+
+
+def _growth_stages(
+    bg: Background, a_grid: np.ndarray, mu_of_a: np.ndarray
+) -> tuple[float, np.ndarray, np.ndarray, np.ndarray]:
+    # RK4 on a uniform ln a grid only ever evaluates the right-hand side at
+    # x_i, x_i + dln/2 and x_i + dln, so Omega_m, dlnH/dlna and mu are
+    # tabulated there once instead of being searched for inside the loop.
+    if a_grid.shape[-1] != mu_of_a.shape[-1]:
         raise ValueError("a_grid and mu_of_a length mismatch")
-    if len(a_grid) < 3:
+    n = a_grid.shape[-1]
+    if n < 3:
         raise ValueError("need at least 3 points")
 
-    d = [0.0 for _ in a_grid]
-    dp = [0.0 for _ in a_grid]
+    lna = np.log(a_grid)
+    dln = (lna[-1] - lna[0]) / (n - 1)
+    x_stage = np.concatenate([lna[:-1], lna[:-1] + 0.5 * dln, lna[:-1] + dln])
+    a_stage = np.exp(x_stage)
+    om_stage = bg.omega_m_of_a(a_stage)
+    om_stage = om_stage.reshape(om_stage.shape[:-1] + (3, n - 1))
+    term_stage = 2.0 + bg.dlnh_dln_a(a_stage)
+    term_stage = term_stage.reshape(term_stage.shape[:-1] + (3, n - 1))
 
-    a0 = a_grid[0]
+    xc = np.clip(x_stage, lna[0], lna[-1])
+    hi = np.clip(np.searchsorted(lna, xc, side="right"), 1, n - 1)
+    lo = hi - 1
+    w = (xc - lna[lo]) / (lna[hi] - lna[lo])
+    mu_stage = (1.0 - w) * mu_of_a[..., lo] + w * mu_of_a[..., hi]
+    mu_stage = mu_stage.reshape(mu_of_a.shape[:-1] + (3, n - 1))
+    return float(dln), om_stage, term_stage, mu_stage
+
+
+def _normalize_growth(d: np.ndarray, dp: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    d1 = d[..., -1:].copy()
+    d1[d1 == 0.0] = 1.0
+    dn = d / d1
+    fn = np.zeros_like(dn)
+    pos = dn > 0.0
+    fn[pos] = (dp / d1)[pos] / dn[pos]
+    return dn, fn
+
+
+def solve_growth(
+    bg: Background,
+    a_grid: ArrayLike,
+    mu_of_a: ArrayLike,
+    method: str = "rk4",
+    rtol: float = 1.0e-8,
+) -> tuple[np.ndarray, np.ndarray]:
+    a_grid = np.asarray(a_grid, dtype=float)
+    mu_of_a = np.asarray(mu_of_a, dtype=float)
+    if method == "rk45":
+        return solve_growth_adaptive(bg, a_grid, mu_of_a, rtol=rtol).at(a_grid)
+    if method != "rk4":
+        raise ValueError(f"unknown growth method: {method}")
+    dln, om_stage, term_stage, mu_stage = _growth_stages(bg, a_grid, mu_of_a)
+    n = len(a_grid)
+
+    # The stepping loop is inherently sequential; run it on Python floats.
+    c_stage = (1.5 * om_stage * mu_stage).tolist()
+    t_stage = term_stage.tolist()
+    c0, c1, c2 = c_stage
+    t0, t1, t2 = t_stage
+    h2 = 0.5 * dln
+    h6 = dln / 6.0
+    d = [0.0] * n
+    dp = [0.0] * n
+
+    a0 = float(a_grid[0])
     d[0] = a0
     dp[0] = a0
 
-    lna = [math.log(a) for a in a_grid]
-    dln = (lna[-1] - lna[0]) / (len(lna) - 1)
-
-    def mu_at_ln_a(x: float) -> float:
-        if x <= lna[0]:
-            return mu_of_a[0]
-        if x >= lna[-1]:
-            return mu_of_a[-1]
-        lo = 0
-        hi = len(lna) - 1
-        while hi - lo > 1:
-            mid = (lo + hi) // 2
-            if lna[mid] <= x:
-                lo = mid
-            else:
-                hi = mid
-        x0 = lna[lo]
-        x1 = lna[hi]
-        w = (x - x0) / (x1 - x0) if x1 != x0 else 0.0
-        return (1.0 - w) * mu_of_a[lo] + w * mu_of_a[hi]
-
-    def rhs(x: float, d_val: float, dp_val: float) -> tuple[float, float]:
-        a = math.exp(x)
-        om = bg.omega_m_of_a(a)
-        mu = mu_at_ln_a(x)
-        term = 2.0 + bg.dlnh_dln_a(a)
-        dd = dp_val
-        ddp = -(term * dp_val) + 1.5 * om * mu * d_val
-        return dd, ddp
-
-    for i in range(len(a_grid) - 1):
-        x = lna[i]
-        k1 = rhs(x, d[i], dp[i])
-        k2 = rhs(x + 0.5 * dln, d[i] + 0.5 * dln * k1[0], dp[i] + 0.5 * dln * k1[1])
-        k3 = rhs(x + 0.5 * dln, d[i] + 0.5 * dln * k2[0], dp[i] + 0.5 * dln * k2[1])
-        k4 = rhs(x + dln, d[i] + dln * k3[0], dp[i] + dln * k3[1])
-
-        d[i + 1] = d[i] + (dln / 6.0) * (k1[0] + 2.0 * k2[0] + 2.0 * k3[0] + k4[0])
-        dp[i + 1] = dp[i] + (dln / 6.0) * (k1[1] + 2.0 * k2[1] + 2.0 * k3[1] + k4[1])
-
-    d1 = d[-1]
+    for i in range(n - 1):
+        y = d[i]
+        p = dp[i]
+        k1 = c0[i] * y - t0[i] * p
+        y2 = y + h2 * p
+        p2 = p + h2 * k1
+        k2 = c1[i] * y2 - t1[i] * p2
+        y3 = y + h2 * p2
+        p3 = p + h2 * k2
+        k3 = c1[i] * y3 - t1[i] * p3
+        y4 = y + dln * p3
+        p4 = p + dln * k3
+        k4 = c2[i] * y4 - t2[i] * p4
+
+        d[i + 1] = y + h6 * (p + 2.0 * p2 + 2.0 * p3 + p4)
+        dp[i + 1] = p + h6 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+
+    return _normalize_growth(np.asarray(d), np.asarray(dp))
+
+
+def solve_growth_batch(
+    bg: Background, a_grid: ArrayLike, mu_rows: ArrayLike, block: int = 2048
+) -> tuple[np.ndarray, np.ndarray]:
+    # One RK4 sweep for every row of mu_rows ([n_models, n_a]); each step
+    # advances all models with array ops. ``bg`` may also carry one
+    # background per row (omega_m0/omega_l0 shaped [n_models, 1]). Stage
+    # coefficients are built in blocks of ``block`` steps to bound memory
+    # at large --na.
+    a_grid = np.asarray(a_grid, dtype=float)
+    mu_rows = np.atleast_2d(np.asarray(mu_rows, dtype=float))
+    if mu_rows.ndim != 2:
+        raise ValueError("mu_rows must be 2-D [n_models, n_a]")
+    n = len(a_grid)
+    m = mu_rows.shape[0]
+    dln, om_stage, term_stage, _ = _growth_stages(bg, a_grid, mu_rows[:1])
+    # Lay the background coefficients out as [3, n - 1, n_models or 1].
+    if om_stage.ndim == 3:
+        if om_stage.shape[0] != m:
+            raise ValueError("one background per mu row required")
+        c_om = np.moveaxis(1.5 * om_stage, 0, -1)
+        term_stage = np.moveaxis(term_stage, 0, -1)
+    else:
+        c_om = 1.5 * om_stage[..., None]
+        term_stage = term_stage[..., None]
+    h2 = 0.5 * dln
+    h6 = dln / 6.0
+
+    lna = np.log(a_grid)
+    d = np.empty((n, m))
+    dp = np.empty((n, m))
+    d[0] = a_grid[0]
+    dp[0] = a_grid[0]
+
+    for start in range(0, n - 1, block):
+        stop = min(start + block, n - 1)
+        # mu at the stage abscissae of steps [start, stop), laid out [3, steps, m].
+        x0 = lna[start:stop]
+        xs = np.clip(np.concatenate([x0, x0 + h2, x0 + dln]), lna[0], lna[-1])
+        hi = np.clip(np.searchsorted(lna, xs, side="right"), 1, n - 1)
+        lo = hi - 1
+        w = ((xs - lna[lo]) / (lna[hi] - lna[lo]))[:, None]
+        mu_t = mu_rows.T
+        mu_blk = ((1.0 - w) * mu_t[lo] + w * mu_t[hi]).reshape(3, stop - start, m)
+        cm = c_om[:, start:stop] * mu_blk
+        tb = term_stage[:, start:stop]
+
+        for j in range(stop - start):
+            i = start + j
+            y = d[i]
+            p = dp[i]
+            k1 = cm[0, j] * y - tb[0, j] * p
+            y2 = y + h2 * p
+            p2 = p + h2 * k1
+            k2 = cm[1, j] * y2 - tb[1, j] * p2
+            y3 = y + h2 * p2
+            p3 = p + h2 * k2
+            k3 = cm[1, j] * y3 - tb[1, j] * p3
+            y4 = y + dln * p3
+            p4 = p + dln * k3
+            k4 = cm[2, j] * y4 - tb[2, j] * p4
+
+            d[i + 1] = y + h6 * (p + 2.0 * p2 + 2.0 * p3 + p4)
+            dp[i + 1] = p + h6 * (k1 + 2.0 * k2 + 2.0 * k3 + k4)
+
+    return _normalize_growth(d.T, dp.T)
+
+
+@dataclass(frozen=True)
+class GrowthSolution:
+    solution: DenseSolution
+    d1: float
+
+    @property
+    def n_rhs(self) -> int:
+        return self.solution.n_rhs
+
+    def at(self, a: ArrayLike) -> tuple[ArrayLike, ArrayLike]:
+        # Normalized D(a) and f(a) = dlnD/dlna from the dense output.
+        y = self.solution(np.log(np.asarray(a, dtype=float)))
+        dn = y[..., 0] / self.d1
+        fn = np.where(dn > 0.0, (y[..., 1] / self.d1) / np.where(dn > 0.0, dn, 1.0), 0.0)
+        return dn, fn
+
+
+def solve_growth_adaptive(
+    bg: Background,
+    a_grid: ArrayLike,
+    mu_of_a: ArrayLike,
+    rtol: float = 1.0e-8,
+    atol: float = 1.0e-14,
+) -> GrowthSolution:
+    # Same ODE and initial conditions as solve_growth, integrated by
+    # dormand_prince from a_grid[0] to a_grid[-1]; mu(a) is linearly
+    # interpolated in ln a between the a_grid nodes.
+    a_grid = np.asarray(a_grid, dtype=float)
+    mu_of_a = np.asarray(mu_of_a, dtype=float)
+    if len(a_grid) != len(mu_of_a):
+        raise ValueError("a_grid and mu_of_a length mismatch")
+    if len(a_grid) < 2:
+        raise ValueError("need at least 2 points")
+    lna = np.log(a_grid)
+    om0 = float(bg.omega_m0)
+    ol0 = float(bg.omega_l0)
+
+    def rhs(x: float, y: np.ndarray) -> np.ndarray:
+        m = om0 * math.exp(-3.0 * x)
+        e2 = m + ol0
+        term = 2.0 - 1.5 * m / e2
+        mu = float(np.interp(x, lna, mu_of_a))
+        return np.array([y[1], -(term * y[1]) + 1.5 * (m / e2) * mu * y[0]])
+
+    a0 = a_grid[0]
+    sol = dormand_prince(rhs, lna[0], lna[-1], [a0, a0], rtol=rtol, atol=atol * a0)
+    d1 = float(sol.y[-1, 0])
     if d1 == 0.0:
         d1 = 1.0
-    dn = [v / d1 for v in d]
-    fn = []
-    for i in range(len(a_grid)):
-        if dn[i] <= 0.0:
-            fn.append(0.0)
-        else:
-            fn.append((dp[i] / d1) / dn[i])
-    return dn, fn
+    return GrowthSolution(solution=sol, d1=d1)
+
+
+C_KM_S = 299792.458
+
+
+@dataclass(frozen=True)
+class DistanceTable:
+    """Tabulated chi(z) = int_0^z dz'/E(z') on a uniform grid in z.
+
+    chi is integrated once with cumulative_simpson and queried by cubic
+    Hermite interpolation using the exact slope dchi/dz = 1/E(z). With node
+    spacing h and M = max |d^3(1/E)/dz^3| on [0, z_max] the absolute error
+    in chi is bounded by
+
+        z_max * h^3 * M / 24    (cumulative quadrature at the nodes)
+      + h^4 * M / 384           (Hermite interpolation between nodes)
+
+    which is stored in ``error_bound`` with M estimated from third
+    differences of the tabulated 1/E. D_L inherits it scaled by
+    (c/H0)(1+z).
+    """
+
+    z: np.ndarray
+    chi: np.ndarray
+    inv_e: np.ndarray
+    error_bound: float
+
+    @classmethod
+    def build(cls, bg: Background, z_max: float, n: int = 4001) -> "DistanceTable":
+        if z_max <= 0.0:
+            raise ValueError("z_max must be > 0")
+        if n < 4:
+            raise ValueError("need at least 4 points")
+        z = linspace(0.0, z_max, n)
+        inv_e = 1.0 / bg.e_of_a(1.0 / (1.0 + z))
+        chi = cumulative_simpson(inv_e, z)
+        h = z[1] - z[0]
+        m3 = float(np.max(np.abs(np.diff(inv_e, 3)))) / h ** 3
+        bound = z_max * h ** 3 * m3 / 24.0 + h ** 4 * m3 / 384.0
+        return cls(z=z, chi=chi, inv_e=inv_e, error_bound=bound)
+
+    @property
+    def z_max(self) -> float:
+        return float(self.z[-1])
+
+    def comoving(self, z: ArrayLike) -> ArrayLike:
+        zq = np.asarray(z, dtype=float)
+        if np.any(zq > self.z_max):
+            raise ValueError("z exceeds distance table z_max")
+        zc = np.maximum(zq, 0.0)
+        h = self.z[1] - self.z[0]
+        idx = np.minimum((zc / h).astype(np.intp), len(self.z) - 2)
+        t = zc / h - idx
+        t2 = t * t
+        t3 = t2 * t
+        h00 = 2.0 * t3 - 3.0 * t2 + 1.0
+        h10 = t3 - 2.0 * t2 + t
+        h01 = -2.0 * t3 + 3.0 * t2
+        h11 = t3 - t2
+        out = (
+            h00 * self.chi[idx]
+            + h10 * h * self.inv_e[idx]
+            + h01 * self.chi[idx + 1]
+            + h11 * h * self.inv_e[idx + 1]
+        )
+        out = np.where(zq > 0.0, out, 0.0)
+        return float(out) if out.ndim == 0 else out
+
+    def luminosity_distance_mpc(self, h0_km_s_mpc: float, z: ArrayLike) -> ArrayLike:
+        zq = np.asarray(z, dtype=float)
+        out = (C_KM_S / h0_km_s_mpc) * (1.0 + zq) * self.comoving(zq)
+        return float(out) if np.ndim(out) == 0 else out
+
+
+Z_COLUMNS = (
+    "z",
+    "E(z)",
+    "D_L_Mpc",
+    "Omega_m(a)",
+    "Omega_Lambda(a)",
+    "S(a)",
+    "mu(a)",
+    "D(a)",
+    "f(z)",
+    "sigma8(z)",
+    "f_sigma8(z)",
+)
+A_COLUMNS = ("a", "S", "mu", "D", "f")
+
+
+class CosmologyTable:
+    """Per-a solution columns in one [n_a, len(A_COLUMNS)] array.
+
+    at_z() evaluates every Z_COLUMNS quantity for an array of redshifts:
+    E and Omega come straight from the Background, D_L from a DistanceTable
+    (rebuilt when a query exceeds its z_max), and S, mu, D, f by four-point
+    Lagrange interpolation in ln a on the uniform growth grid.
+    """
+
+    def __init__(
+        self,
+        bg: Background,
+        a_grid: ArrayLike,
+        s_grid: ArrayLike,
+        mu_grid: ArrayLike,
+        d_norm: ArrayLike,
+        f_ln: ArrayLike,
+        sigma8_0: float,
+        h0: float,
+    ):
+        a_grid = np.asarray(a_grid, dtype=float)
+        lna = np.log(a_grid)
+        step = np.diff(lna)
+        if len(a_grid) < 4 or np.any(np.abs(step - step[0]) > 1.0e-9 * abs(step[0])):
+            raise ValueError("a_grid must be uniform in ln a with at least 4 points")
+        self.bg = bg
+        self.sigma8_0 = sigma8_0
+        self.h0 = h0
+        self.data = np.ascontiguousarray(np.column_stack([a_grid, s_grid, mu_grid, d_norm, f_ln]))
+        self.ln_a = lna
+        self._distances: Optional[DistanceTable] = None
+
+    def column(self, name: str) -> np.ndarray:
+        return self.data[:, A_COLUMNS.index(name)]
+
+    def _comoving(self, z: np.ndarray) -> np.ndarray:
+        z_top = float(np.max(z)) if z.size else 0.0
+        if z_top <= 0.0:
+            return np.zeros_like(z)
+        if self._distances is None or self._distances.z_max < z_top:
+            self._distances = self.bg.distance_table(z_top)
+        return self._distances.comoving(z)
+
+    def at_z(self, z: ArrayLike) -> np.ndarray:
+        # [n_z, len(Z_COLUMNS)] for a 1-D array of redshifts.
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        a = 1.0 / (1.0 + z)
+        if np.any(z < 0.0) or np.any(a < self.data[0, 0] * (1.0 - 1.0e-12)):
+            raise ValueError("redshift outside the tabulated range")
+        ln_a = np.clip(np.log(a), self.ln_a[0], self.ln_a[-1])
+        idx, w = cubic_stencil(self.ln_a, ln_a)
+        interp = np.einsum("zk,zkc->zc", w, self.data[idx, 1:])
+        out = np.empty((len(z), len(Z_COLUMNS)))
+        out[:, 0] = z
+        out[:, 1] = self.bg.e_of_a(a)
+        out[:, 2] = (C_KM_S / self.h0) * (1.0 + z) * self._comoving(z)
+        out[:, 3] = self.bg.omega_m_of_a(a)
+        out[:, 4] = self.bg.omega_l_of_a(a)
+        out[:, 5:9] = interp
+        out[:, 9] = self.sigma8_0 * out[:, 7]
+        out[:, 10] = out[:, 8] * out[:, 9]
+        return out
 
 
 def luminosity_distance_mpc(bg: Background, h0_km_s_mpc: float, z: float, n: int) -> float:
     if z <= 0.0:
         return 0.0
-    c_km_s = 299792.458
     z_grid = linspace(0.0, z, n)
-    integrand = []
-    for zz in z_grid:
-        a = 1.0 / (1.0 + zz)
-        e = bg.e_of_a(a)
-        integrand.append(1.0 / e)
+    integrand = 1.0 / bg.e_of_a(1.0 / (1.0 + z_grid))
     chi = simpson(integrand, z_grid)
-    return (c_km_s / h0_km_s_mpc) * (1.0 + z) * chi
+    return (C_KM_S / h0_km_s_mpc) * (1.0 + z) * chi
 
 
-def h0_t0(bg: Background, a_min: float, n: int) -> float:
+def h0_t0_adaptive(bg: Background, a_min: float, rtol: float = 1.0e-10) -> DenseSolution:
+    # H0 t0 = int dln a / E(a) from ln a_min to 0 by Dormand-Prince; the value
+    # is y[-1, 0] and n_rhs counts integrand evaluations.
     if a_min <= 0.0:
         raise ValueError("a_min must be > 0")
+    return dormand_prince(
+        lambda x, y: np.array([1.0 / math.sqrt(bg.omega_m0 * math.exp(-3.0 * x) + bg.omega_l0)]),
+        math.log(a_min),
+        0.0,
+        [0.0],
+        rtol=rtol,
+        atol=rtol * 1.0e-3,
+    )
+
+
+def h0_t0(
+    bg: Background, a_min: float, n: int = 20001, method: str = "simpson", rtol: float = 1.0e-10
+) -> float:
+    if a_min <= 0.0:
+        raise ValueError("a_min must be > 0")
+    if method == "rk45":
+        return float(h0_t0_adaptive(bg, a_min, rtol).y[-1, 0])
+    if method != "simpson":
+        raise ValueError(f"unknown h0_t0 method: {method}")
     ln_a_grid = linspace(math.log(a_min), 0.0, n)
-    integrand = []
-    for ln_a in ln_a_grid:
-        a = math.exp(ln_a)
-        e = bg.e_of_a(a)
-        integrand.append(1.0 / e)
+    integrand = 1.0 / bg.e_of_a(np.exp(ln_a_grid))
     return simpson(integrand, ln_a_grid)
 
 
+def make_background(model: str, epsilon: float, omega_lambda: float, omega_m: float) -> Background:
+    if model == "epsilon":
+        omega_l0 = 0.5 * (1.0 + epsilon)
+        omega_m0 = 0.5 * (1.0 - epsilon)
+    else:
+        omega_l0 = omega_lambda
+        omega_m0 = omega_m
+
+    s = omega_l0 + omega_m0
+    if s <= 0.0:
+        raise ValueError("invalid density parameters")
+    return Background(omega_m0=omega_m0 / s, omega_l0=omega_l0 / s)
+
+
+def compute_s_grid(bg: Background, a_grid: np.ndarray, sdef: str) -> np.ndarray:
+    if sdef == "ratio":
+        return compute_s_of_a_ratio(bg, a_grid)
+    return compute_s_of_a(bg, a_grid)
+
+
+def solve_growth_models(
+    epsilon: ArrayLike,
+    epsilon_grav: ArrayLike,
+    a_grid: np.ndarray,
+    model: str = "epsilon",
+    omega_lambda: float = 0.685,
+    omega_m: float = 0.315,
+    mu: str = "sfe",
+    sdef: str = "ratio",
+) -> tuple[np.ndarray, np.ndarray]:
+    # D and f on a_grid for many (epsilon, epsilon_grav) pairs in a single
+    # solve_growth_batch call; returns [n_models, n_a] arrays.
+    eps = np.atleast_1d(np.asarray(epsilon, dtype=float))
+    eg = np.atleast_1d(np.asarray(epsilon_grav, dtype=float))
+    eps, eg = np.broadcast_arrays(eps, eg)
+    if model == "epsilon":
+        om = 0.5 * (1.0 - eps)
+        ol = 0.5 * (1.0 + eps)
+    else:
+        om = np.full(eps.shape, omega_m)
+        ol = np.full(eps.shape, omega_lambda)
+    total = om + ol
+    if np.any(total <= 0.0):
+        raise ValueError("invalid density parameters")
+    bg = Background(omega_m0=(om / total)[:, None], omega_l0=(ol / total)[:, None])
+    if mu == "lcdm":
+        mu_rows = np.ones((len(eps), len(a_grid)))
+    else:
+        mu_rows = 1.0 - eg[:, None] * compute_s_grid(bg, a_grid, sdef)
+    return solve_growth_batch(bg, a_grid, mu_rows)
+
+
+def parse_z_grid(z_list: str, zmax: float, nz: int) -> np.ndarray:
+    z_grid = [float(part) for part in z_list.split(",") if part.strip()]
+    if not z_grid:
+        return linspace(0.0, zmax, nz)
+    return np.asarray(z_grid, dtype=float)
+
+
+SCAN_PARAMS = ("epsilon", "epsilon_grav", "sigma8_0", "h0")
+
+
+def parse_scan_points(spec: str, defaults: dict[str, float]) -> np.ndarray:
+    # ``spec`` is either a CSV grid file whose header names a subset of
+    # SCAN_PARAMS, or ranges "name=start:stop:num,..." expanded as a
+    # Cartesian product. Unlisted parameters keep their CLI values.
+    if os.path.isfile(spec):
+        table = np.genfromtxt(spec, delimiter=",", names=True, ndmin=1)
+        cols = table.dtype.names or ()
+        unknown = [c for c in cols if c not in SCAN_PARAMS]
+        if unknown:
+            raise ValueError(f"unknown scan columns: {', '.join(unknown)}")
+        points = np.empty((table.shape[0], len(SCAN_PARAMS)))
+        for k, name in enumerate(SCAN_PARAMS):
+            points[:, k] = table[name] if name in cols else defaults[name]
+        return points
+
+    axes = {name: np.array([defaults[name]]) for name in SCAN_PARAMS}
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        name, _, rng = part.partition("=")
+        name = name.strip().replace("-", "_")
+        if name not in SCAN_PARAMS:
+            raise ValueError(f"unknown scan parameter: {name}")
+        fields = rng.split(":")
+        if len(fields) == 1:
+            axes[name] = np.array([float(fields[0])])
+        elif len(fields) == 3:
+            axes[name] = linspace(float(fields[0]), float(fields[1]), int(fields[2]))
+        else:
+            raise ValueError(f"bad range for {name}: expected start:stop:num")
+    mesh = np.meshgrid(*(axes[name] for name in SCAN_PARAMS), indexing="ij")
+    return np.stack([m.ravel() for m in mesh], axis=1)
+
+
+def _scan_chunk(task: dict) -> int:
+    # Evaluate one contiguous block of scan points and write it atomically.
+    # Points sharing a background are grouped so their growth equations go
+    # through a single solve_growth_batch call (fixed-step RK4); with
+    # --integrator adaptive each row is solved by Dormand-Prince instead.
+    points = task["points"]
+    z_grid = task["z_grid"]
+    a_grid = logspace(1.0e-3, 1.0, task["na"])
+    lna = np.log(a_grid)
+    idx, w = cubic_stencil(lna, np.clip(-np.log1p(z_grid), lna[0], lna[-1]))
+    n_pts = points.shape[0]
+    e_out = np.empty((n_pts, len(z_grid)))
+    dl_out = np.empty_like(e_out)
+    fs8_out = np.empty_like(e_out)
+
+    eps_col = points[:, 0]
+    for eps in np.unique(eps_col):
+        rows = np.flatnonzero(eps_col == eps)
+        bg = make_background(task["model"], float(eps), task["omega_lambda"], task["omega_m"])
+        if task["mu"] == "lcdm":
+            mu_rows = np.ones((len(rows), len(a_grid)))
+        else:
+            s_grid = compute_s_grid(bg, a_grid, task["sdef"])
+            mu_rows = 1.0 - points[rows, 1, None] * s_grid
+        if task["integrator"] == "adaptive":
+            solved = [solve_growth(bg, a_grid, mu, method="rk45", rtol=task["rtol"]) for mu in mu_rows]
+            d_norm = np.array([d for d, _ in solved])
+            f_ln = np.array([f for _, f in solved])
+        else:
+            d_norm, f_ln = solve_growth_batch(bg, a_grid, mu_rows)
+
+        z_top = float(np.max(z_grid))
+        chi = bg.distance_table(z_top).comoving(z_grid) if z_top > 0.0 else np.zeros_like(z_grid)
+        e_out[rows] = bg.e_of_a(1.0 / (1.0 + z_grid))
+        dl_out[rows] = (C_KM_S / points[rows, 3, None]) * (1.0 + z_grid) * chi
+        fd = np.einsum("mzk,zk->mz", (f_ln * d_norm)[:, idx], w)
+        fs8_out[rows] = points[rows, 2, None] * fd
+
+    tmp = task["path"] + ".tmp.npz"
+    np.savez(tmp, start=task["start"], e=e_out, d_l=dl_out, f_sigma8=fs8_out)
+    os.replace(tmp, task["path"])
+    return task["start"]
+
+
+def run_scan(args: argparse.Namespace) -> int:
+    defaults = {
+        "epsilon": args.epsilon,
+        "epsilon_grav": args.epsilon_grav,
+        "sigma8_0": args.sigma8_0,
+        "h0": args.h0,
+    }
+    try:
+        points = parse_scan_points(args.scan, defaults)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    z_grid = parse_z_grid(args.z_list, args.zmax, args.nz)
+
+    config = {
+        "model": args.model,
+        "omega_lambda": args.omega_lambda,
+        "omega_m": args.omega_m,
+        "mu": args.mu,
+        "sdef": args.sdef,
+        "na": args.na,
+        "integrator": args.integrator,
+        "rtol": args.rtol,
+        "z": z_grid.tolist(),
+        "n_points": int(points.shape[0]),
+        "points_sha256": hashlib.sha256(np.ascontiguousarray(points).tobytes()).hexdigest(),
+        "chunk": args.scan_chunk,
+    }
+    parts_dir = args.scan_out + ".parts"
+    os.makedirs(parts_dir, exist_ok=True)
+    config_path = os.path.join(parts_dir, "config.json")
+    points_path = os.path.join(parts_dir, "points.npy")
+    if os.path.exists(config_path):
+        # Chunks are addressed by row offset only, so a resume must see the
+        # exact same points or it would relabel old results.
+        with open(config_path) as fh:
+            same = json.load(fh) == config
+        if same and os.path.exists(points_path):
+            same = np.array_equal(np.load(points_path), points)
+        if not same:
+            raise SystemExit(f"{parts_dir} holds a checkpoint for a different scan")
+    else:
+        np.save(points_path, points)
+        with open(config_path, "w") as fh:
+            json.dump(config, fh)
+
+    tasks = []
+    for start in range(0, points.shape[0], args.scan_chunk):
+        path = os.path.join(parts_dir, f"chunk_{start:09d}.npz")
+        if os.path.exists(path):
+            continue
+        tasks.append({
+            "start": start,
+            "path": path,
+            "points": points[start : start + args.scan_chunk],
+            "z_grid": z_grid,
+            **{
+                k: config[k]
+                for k in ("model", "omega_lambda", "omega_m", "mu", "sdef", "na", "integrator", "rtol")
+            },
+        })
+
+    n_chunks = -(-points.shape[0] // args.scan_chunk)
+    print("scan_points", points.shape[0])
+    print("scan_chunks", n_chunks, "pending", len(tasks))
+    if tasks:
+        workers = args.workers if args.workers > 0 else (os.cpu_count() or 1)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_scan_chunk, t) for t in tasks]
+            for done, fut in enumerate(as_completed(futures), 1):
+                fut.result()
+                print(f"chunk {done}/{len(tasks)}", flush=True)
+
+    e_all = np.empty((points.shape[0], len(z_grid)))
+    dl_all = np.empty_like(e_all)
+    fs8_all = np.empty_like(e_all)
+    for start in range(0, points.shape[0], args.scan_chunk):
+        with np.load(os.path.join(parts_dir, f"chunk_{start:09d}.npz")) as part:
+            stop = start + part["e"].shape[0]
+            e_all[start:stop] = part["e"]
+            dl_all[start:stop] = part["d_l"]
+            fs8_all[start:stop] = part["f_sigma8"]
+
+    out = {name: points[:, k] for k, name in enumerate(SCAN_PARAMS)}
+    np.savez(
+        args.scan_out,
+        meta=np.array(json.dumps(config)),
+        z=z_grid,
+        e=e_all,
+        d_l=dl_all,
+        f_sigma8=fs8_all,
+        **out,
+    )
+    shutil.rmtree(parts_dir)
+    print("scan_out", args.scan_out)
+    return 0
+
+
+OUTPUT_FORMATS = (".npz", ".npy", ".parquet")
+
+
+def write_table(path: str, rows: np.ndarray, columns: tuple[str, ...], meta: dict) -> None:
+    # One bulk write of an [n, len(columns)] float table plus run metadata.
+    #   .npz      arrays "table", "columns" and a JSON "meta" string
+    #   .npy      structured array with one field per column; the metadata
+    #             goes to a <path>.json sidecar since NPY headers are fixed
+    #   .parquet  via pandas (pyarrow engine); metadata in DataFrame.attrs
+    rows = np.ascontiguousarray(rows, dtype=float)
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".npz":
+        np.savez(path, table=rows, columns=np.array(columns), meta=np.array(json.dumps(meta)))
+    elif ext == ".npy":
+        dtype = np.dtype([(name, "f8") for name in columns])
+        np.save(path, rows.view(dtype).reshape(-1))
+        with open(path + ".json", "w") as fh:
+            json.dump(meta, fh, indent=2)
+    elif ext == ".parquet":
+        # pandas imports fine without a parquet engine; to_parquet then
+        # raises ImportError for the missing pyarrow/fastparquet.
+        try:
+            import pandas as pd
+
+            df = pd.DataFrame(rows, columns=list(columns), copy=False)
+            df.attrs["cosmology"] = meta
+            df.to_parquet(path, index=False)
+        except ImportError:
+            raise SystemExit("parquet output requires pandas (and pyarrow)")
+    else:
+        raise ValueError(f"unsupported output format: {ext or path}")
+
+
 def main() -> int:
     p = argparse.ArgumentParser(prog="cosmology")
     p.add_argument("--model", choices=["epsilon", "calibrate"], default="epsilon")
@@ -207,49 +963,50 @@ def main() -> int:
     p.add_argument("--print-h0t0", action="store_true")
     p.add_argument("--extended", action="store_true")
     p.add_argument("--compare-fsigma8", action="store_true")
+    p.add_argument("--scan", type=str, default="")
+    p.add_argument("--scan-out", type=str, default="cosmology_scan.npz")
+    p.add_argument("--scan-chunk", type=int, default=256)
+    p.add_argument("--workers", type=int, default=0)
+    p.add_argument("--integrator", choices=["fixed", "adaptive"], default="fixed")
+    p.add_argument("--rtol", type=float, default=1.0e-8)
+    p.add_argument("--output", type=str, default="")
     args = p.parse_args()
 
-    if args.model == "epsilon":
-        eps = args.epsilon
-        omega_l0 = 0.5 * (1.0 + eps)
-        omega_m0 = 0.5 * (1.0 - eps)
-    else:
-        omega_l0 = args.omega_lambda
-        omega_m0 = args.omega_m
+    if args.output and os.path.splitext(args.output)[1].lower() not in OUTPUT_FORMATS:
+        raise SystemExit(f"--output must end in one of {', '.join(OUTPUT_FORMATS)}")
 
-    s = omega_l0 + omega_m0
-    if s <= 0.0:
-        raise SystemExit("invalid density parameters")
-    omega_l0 /= s
-    omega_m0 /= s
+    if args.scan:
+        if args.output:
+            p.error("--output cannot be combined with --scan (scan results go to --scan-out)")
+        if not args.scan_out.endswith(".npz"):
+            args.scan_out += ".npz"
+        return run_scan(args)
 
-    bg = Background(omega_m0=omega_m0, omega_l0=omega_l0)
+    try:
+        bg = make_background(args.model, args.epsilon, args.omega_lambda, args.omega_m)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+    omega_m0 = bg.omega_m0
+    omega_l0 = bg.omega_l0
 
     a_grid = logspace(1.0e-3, 1.0, args.na)
-    if args.sdef == "ratio":
-        s_grid = compute_s_of_a_ratio(bg, a_grid)
-    else:
-        s_grid = compute_s_of_a(bg, a_grid)
+    s_grid = compute_s_grid(bg, a_grid, args.sdef)
 
     if args.mu == "lcdm":
-        mu_grid = [1.0 for _ in a_grid]
+        mu_grid = np.ones_like(a_grid)
     else:
-        eg = args.epsilon_grav
-        mu_grid = [1.0 - eg * ss for ss in s_grid]
-
-    d_norm, f_ln = solve_growth(bg, a_grid, mu_grid)
-
-    if args.z_list.strip():
-        z_grid = []
-        for part in args.z_list.split(","):
-            s_part = part.strip()
-            if not s_part:
-                continue
-            z_grid.append(float(s_part))
-        if not z_grid:
-            z_grid = linspace(0.0, args.zmax, args.nz)
-    else:
-        z_grid = linspace(0.0, args.zmax, args.nz)
+        mu_grid = 1.0 - args.epsilon_grav * s_grid
+
+    adaptive = args.integrator == "adaptive"
+    d_norm, f_ln = solve_growth(bg, a_grid, mu_grid, method="rk45" if adaptive else "rk4", rtol=args.rtol)
+
+    z_grid = parse_z_grid(args.z_list, args.zmax, args.nz)
+    table = CosmologyTable(bg, a_grid, s_grid, mu_grid, d_norm, f_ln, args.sigma8_0, args.h0)
+    try:
+        rows = table.at_z(z_grid)
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
     print("model", args.model)
     print("omega_m0", f"{omega_m0:.9f}")
     print("omega_lambda0", f"{omega_l0:.9f}")
@@ -259,72 +1016,36 @@ def main() -> int:
     print("sigma8_0", f"{args.sigma8_0:.9f}")
     print("h0", f"{args.h0:.6f}")
     if args.print_h0t0:
-        print("h0_t0", f"{h0_t0(bg, a_min=1.0e-6, n=20001):.9f}")
+        t0 = h0_t0(bg, a_min=1.0e-6, n=20001, method="rk45" if adaptive else "simpson", rtol=args.rtol)
+        print("h0_t0", f"{t0:.9f}")
     print("")
-    if args.extended:
-        print("z,E(z),D_L_Mpc,Omega_m(a),Omega_Lambda(a),S(a),mu(a),D(a),f(z),sigma8(z),f_sigma8(z)")
+    if args.output:
+        skip = ("output", "scan", "scan_out", "scan_chunk", "workers")
+        meta = {k: v for k, v in vars(args).items() if k not in skip}
+        meta.update(omega_m0=omega_m0, omega_lambda0=omega_l0, columns=list(Z_COLUMNS))
+        try:
+            write_table(args.output, rows, Z_COLUMNS, meta)
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        print("output", args.output)
+        print("rows", rows.shape[0])
     else:
-        print("z,E(z),D_L_Mpc,D(a),f(z),sigma8(z),f_sigma8(z)")
-
-    d1 = d_norm[-1]
-    if d1 == 0.0:
-        d1 = 1.0
-
-    for z in z_grid:
-        a = 1.0 / (1.0 + z)
-        idx = int(round((math.log(a) - math.log(a_grid[0])) / (math.log(a_grid[-1]) - math.log(a_grid[0])) * (len(a_grid) - 1)))
-        if idx < 0:
-            idx = 0
-        if idx >= len(a_grid):
-            idx = len(a_grid) - 1
-
-        ez = bg.e_of_a(a)
-        dl = luminosity_distance_mpc(bg, args.h0, z, n=2001)
-        om = bg.omega_m_of_a(a)
-        ol = bg.omega_l_of_a(a)
-        ss = s_grid[idx]
-        muu = mu_grid[idx]
-        d = d_norm[idx]
-        fz = f_ln[idx]
-        s8 = args.sigma8_0 * d
-        fs8 = fz * s8
         if args.extended:
-            print(
-                f"{z:.6f},"
-                f"{ez:.9f},"
-                f"{dl:.6f},"
-                f"{om:.9f},"
-                f"{ol:.9f},"
-                f"{ss:.9f},"
-                f"{muu:.9f},"
-                f"{d:.9f},"
-                f"{fz:.9f},"
-                f"{s8:.9f},"
-                f"{fs8:.9f}"
-            )
+            cols = list(range(len(Z_COLUMNS)))
         else:
-            print(
-                f"{z:.6f},"
-                f"{ez:.9f},"
-                f"{dl:.6f},"
-                f"{d:.9f},"
-                f"{fz:.9f},"
-                f"{s8:.9f},"
-                f"{fs8:.9f}"
-            )
+            names = ("z", "E(z)", "D_L_Mpc", "D(a)", "f(z)", "sigma8(z)", "f_sigma8(z)")
+            cols = [Z_COLUMNS.index(c) for c in names]
+        print(",".join(Z_COLUMNS[c] for c in cols))
+        fmts = ["{:.6f}" if Z_COLUMNS[c] in ("z", "D_L_Mpc") else "{:.9f}" for c in cols]
+        for row in rows[:, cols].tolist():
+            print(",".join(f.format(v) for f, v in zip(fmts, row)))
 
     if args.compare_fsigma8:
         targets = {0.32: 0.438, 0.57: 0.447, 0.70: 0.442}
+        preds = table.at_z(list(targets))[:, Z_COLUMNS.index("f_sigma8(z)")]
         print("")
         print("fsigma8_compare(z,pred,target,delta,delta_percent)")
-        for zt in [0.32, 0.57, 0.70]:
-            a = 1.0 / (1.0 + zt)
-            idx = int(round((math.log(a) - math.log(a_grid[0])) / (math.log(a_grid[-1]) - math.log(a_grid[0])) * (len(a_grid) - 1)))
-            if idx < 0:
-                idx = 0
-            if idx >= len(a_grid):
-                idx = len(a_grid) - 1
-            pred = f_ln[idx] * (args.sigma8_0 * d_norm[idx])
+        for zt, pred in zip(targets, preds):
             tgt = targets[zt]
             delta = pred - tgt
             pct = (delta / tgt) * 100.0 if tgt != 0.0 else 0.0
@@ -335,5 +1056,3 @@ def main() -> int:
 
 if __name__ == "__main__":
     raise SystemExit(main())
-
-
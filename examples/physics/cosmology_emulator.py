@@ -0,0 +1,295 @@
+import argparse
+import json
+import math
+import time
+from typing import Optional
+
+import numpy as np
+
+from cosmology import cubic_stencil, logspace, parse_z_grid, solve_growth_models
+
+
+BOX_PARAMS = ("epsilon", "epsilon_grav", "sigma8_0")
+
+
+def _cheb_nodes(lo: float, hi: float, n: int) -> np.ndarray:
+    t = np.cos(np.pi * (np.arange(n) + 0.5) / n)[::-1]
+    return 0.5 * (lo + hi) + 0.5 * (hi - lo) * t
+
+
+def _cheb_basis(x: np.ndarray, lo: float, hi: float, degree: int) -> np.ndarray:
+    # T_0..T_degree at the mapped points, [len(x), degree + 1]. Same
+    # recurrence as chebyshev.chebvander without its per-call overhead,
+    # which dominated single-point evaluation.
+    t = (2.0 * np.atleast_1d(np.asarray(x, dtype=float)) - (lo + hi)) / (hi - lo)
+    v = np.empty((t.shape[0], degree + 1))
+    v[:, 0] = 1.0
+    if degree > 0:
+        t2 = 2.0 * t
+        v[:, 1] = t
+        for i in range(2, degree + 1):
+            v[:, i] = v[:, i - 1] * t2 - v[:, i - 2]
+    return v
+
+
+def _contract(te: np.ndarray, tg: np.ndarray, tz: np.ndarray, coeff: np.ndarray) -> np.ndarray:
+    # sum_ijk te[m,i] tg[m,j] tz[z,k] coeff[i,j,k] as three explicit steps;
+    # einsum(optimize=True) re-plans the path on every call, which dominated
+    # single-point evaluation.
+    de, dg, dz = coeff.shape
+    inner = (te @ coeff.reshape(de, -1)).reshape(-1, dg, dz)
+    return np.einsum("mjk,mj->mk", inner, tg) @ tz.T
+
+
+class GrowthEmulator:
+    """Tensor Chebyshev emulator of D(z) and f(z) over (epsilon, epsilon_grav, z).
+
+    sigma8_0 enters fsigma8 = sigma8_0 * f * D linearly, so it is applied
+    exactly and only bounded by the box. Coefficients come from exact
+    interpolation on first-kind Chebyshev nodes of a solve_growth_models
+    run. ``max_error`` records the largest |delta fsigma8| seen on random
+    validation points inside the box. Queries outside the box fall back to
+    the exact solver.
+    """
+
+    def __init__(
+        self,
+        box: dict[str, tuple[float, float]],
+        z_max: float,
+        coeff_d: np.ndarray,
+        coeff_f: np.ndarray,
+        config: dict,
+        max_error: Optional[dict[str, float]] = None,
+    ):
+        self.box = {k: (float(v[0]), float(v[1])) for k, v in box.items()}
+        self.z_max = float(z_max)
+        self.coeff_d = np.asarray(coeff_d, dtype=float)
+        self.coeff_f = np.asarray(coeff_f, dtype=float)
+        self.config = dict(config)
+        self.max_error = dict(max_error or {})
+        self.a_grid = logspace(1.0e-3, 1.0, self.config["na"])
+        self.n_fallback = 0
+        self._z_basis: Optional[tuple[np.ndarray, np.ndarray]] = None
+
+    @classmethod
+    def train(
+        cls,
+        box: dict[str, tuple[float, float]],
+        z_max: float = 3.0,
+        degree: tuple[int, int, int] = (12, 12, 24),
+        n_validate: int = 64,
+        seed: int = 0,
+        model: str = "epsilon",
+        omega_lambda: float = 0.685,
+        omega_m: float = 0.315,
+        mu: str = "sfe",
+        sdef: str = "ratio",
+        na: int = 2001,
+    ) -> "GrowthEmulator":
+        missing = [p for p in BOX_PARAMS if p not in box]
+        if missing:
+            raise ValueError(f"box is missing: {', '.join(missing)}")
+        if any(lo >= hi for lo, hi in box.values()):
+            raise ValueError("box bounds must satisfy lo < hi")
+        if not 0.0 < z_max < 1.0e3 - 1.0:
+            raise ValueError("z_max outside the growth grid")
+        config = {
+            "model": model,
+            "omega_lambda": omega_lambda,
+            "omega_m": omega_m,
+            "mu": mu,
+            "sdef": sdef,
+            "na": na,
+            "degree": list(degree),
+        }
+        emu = cls(box, z_max, np.zeros(0), np.zeros(0), config)
+
+        de, dg, dz = degree
+        eps_nodes = _cheb_nodes(*emu.box["epsilon"], de + 1)
+        eg_nodes = _cheb_nodes(*emu.box["epsilon_grav"], dg + 1)
+        z_nodes = _cheb_nodes(0.0, z_max, dz + 1)
+        ee, gg = np.meshgrid(eps_nodes, eg_nodes, indexing="ij")
+        d_vals, f_vals = emu._exact(ee.ravel(), gg.ravel(), z_nodes)
+        shape = (de + 1, dg + 1, dz + 1)
+
+        inv_e = np.linalg.inv(_cheb_basis(eps_nodes, *emu.box["epsilon"], de))
+        inv_g = np.linalg.inv(_cheb_basis(eg_nodes, *emu.box["epsilon_grav"], dg))
+        inv_z = np.linalg.inv(_cheb_basis(z_nodes, 0.0, z_max, dz))
+        fit = "ai,bj,ck,ijk->abc"
+        emu.coeff_d = np.einsum(fit, inv_e, inv_g, inv_z, d_vals.reshape(shape), optimize=True)
+        emu.coeff_f = np.einsum(fit, inv_e, inv_g, inv_z, f_vals.reshape(shape), optimize=True)
+        emu.max_error = emu.validate(n_validate, seed)
+        return emu
+
+    def _exact(self, eps: np.ndarray, eg: np.ndarray, z: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        c = self.config
+        d_norm, f_ln = solve_growth_models(
+            eps, eg, self.a_grid, c["model"], c["omega_lambda"], c["omega_m"], c["mu"], c["sdef"]
+        )
+        lna = np.log(self.a_grid)
+        idx, w = cubic_stencil(lna, np.clip(-np.log1p(z), lna[0], lna[-1]))
+        d = np.einsum("mzk,zk->mz", d_norm[:, idx], w)
+        f = np.einsum("mzk,zk->mz", f_ln[:, idx], w)
+        return d, f
+
+    def in_box(self, eps: np.ndarray, eg: np.ndarray, s8: np.ndarray) -> np.ndarray:
+        ok = np.ones(np.shape(eps), dtype=bool)
+        for name, vals in zip(BOX_PARAMS, (eps, eg, s8)):
+            lo, hi = self.box[name]
+            ok &= (vals >= lo) & (vals <= hi)
+        return ok
+
+    def growth(self, epsilon: np.ndarray, epsilon_grav: np.ndarray, z: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # D(z), f(z) as [n_points, n_z]; points outside the box or z outside
+        # [0, z_max] are solved exactly.
+        eps = np.atleast_1d(np.asarray(epsilon, dtype=float))
+        eg = np.atleast_1d(np.asarray(epsilon_grav, dtype=float))
+        eps, eg = np.broadcast_arrays(eps, eg)
+        z = np.atleast_1d(np.asarray(z, dtype=float))
+        de, dg, dz = self.coeff_d.shape
+        d = np.empty((len(eps), len(z)))
+        f = np.empty_like(d)
+
+        ok = self.in_box(eps, eg, np.full(eps.shape, self.box["sigma8_0"][0]))
+        if np.any(z < 0.0) or np.any(z > self.z_max):
+            ok[:] = False
+        if np.any(ok):
+            te = _cheb_basis(eps[ok], *self.box["epsilon"], de - 1)
+            tg = _cheb_basis(eg[ok], *self.box["epsilon_grav"], dg - 1)
+            # Queries usually reuse one z grid; keep its basis.
+            if (
+                self._z_basis is None
+                or self._z_basis[0].shape != z.shape
+                or not np.array_equal(self._z_basis[0], z)
+            ):
+                self._z_basis = (z.copy(), _cheb_basis(z, 0.0, self.z_max, dz - 1))
+            tz = self._z_basis[1]
+            d[ok] = _contract(te, tg, tz, self.coeff_d)
+            f[ok] = _contract(te, tg, tz, self.coeff_f)
+        if not np.all(ok):
+            bad = ~ok
+            self.n_fallback += int(bad.sum())
+            d[bad], f[bad] = self._exact(eps[bad], eg[bad], z)
+        return d, f
+
+    def fsigma8(self, epsilon, epsilon_grav, sigma8_0, z) -> np.ndarray:
+        eps, eg, s8 = np.broadcast_arrays(
+            *(np.atleast_1d(np.asarray(v, dtype=float)) for v in (epsilon, epsilon_grav, sigma8_0))
+        )
+        # sigma8_0 only scales the result, so it never needs the exact solver;
+        # growth() counts the real fallbacks.
+        d, f = self.growth(eps, eg, z)
+        return s8[:, None] * f * d
+
+    def validate(self, n: int, seed: int = 0) -> dict[str, float]:
+        rng = np.random.default_rng(seed)
+        eps = rng.uniform(*self.box["epsilon"], n)
+        eg = rng.uniform(*self.box["epsilon_grav"], n)
+        z = np.linspace(0.0, self.z_max, 61)
+        d_ex, f_ex = self._exact(eps, eg, z)
+        d_em, f_em = self.growth(eps, eg, z)
+        s8_hi = max(abs(v) for v in self.box["sigma8_0"])
+        return {
+            "D": float(np.max(np.abs(d_em - d_ex))),
+            "f": float(np.max(np.abs(f_em - f_ex))),
+            "fsigma8": float(s8_hi * np.max(np.abs(f_em * d_em - f_ex * d_ex))),
+            "n_validate": n,
+        }
+
+    def save(self, path: str) -> None:
+        np.savez(
+            path,
+            coeff_d=self.coeff_d,
+            coeff_f=self.coeff_f,
+            meta=np.array(json.dumps({
+                "box": self.box,
+                "z_max": self.z_max,
+                "config": self.config,
+                "max_error": self.max_error,
+            })),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "GrowthEmulator":
+        with np.load(path) as fh:
+            meta = json.loads(str(fh["meta"]))
+            return cls(meta["box"], meta["z_max"], fh["coeff_d"], fh["coeff_f"],
+                       meta["config"], meta["max_error"])
+
+
+def _range(text: str) -> tuple[float, float]:
+    lo, _, hi = text.partition(":")
+    return float(lo), float(hi)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(prog="cosmology_emulator")
+    sub = p.add_subparsers(dest="cmd", required=True)
+
+    t = sub.add_parser("train")
+    t.add_argument("--out", type=str, default="growth_emulator.npz")
+    t.add_argument("--epsilon", type=_range, default=(0.25, 0.5))
+    t.add_argument("--epsilon-grav", type=_range, default=(-1.0, 1.0))
+    t.add_argument("--sigma8-0", type=_range, default=(0.6, 1.0))
+    t.add_argument("--zmax", type=float, default=3.0)
+    t.add_argument("--degree", type=str, default="12,12,24")
+    t.add_argument("--validate", type=int, default=64)
+    t.add_argument("--model", choices=["epsilon", "calibrate"], default="epsilon")
+    t.add_argument("--omega-lambda", type=float, default=0.685)
+    t.add_argument("--omega-m", type=float, default=0.315)
+    t.add_argument("--mu", choices=["lcdm", "sfe"], default="sfe")
+    t.add_argument("--sdef", choices=["ratio", "cumulative"], default="ratio")
+    t.add_argument("--na", type=int, default=2001)
+
+    e = sub.add_parser("eval")
+    e.add_argument("path", type=str)
+    e.add_argument("--epsilon", type=float, default=1.0 / math.e)
+    e.add_argument("--epsilon-grav", type=float, default=0.0)
+    e.add_argument("--sigma8-0", type=float, default=0.811)
+    e.add_argument("--zmax", type=float, default=2.0)
+    e.add_argument("--nz", type=int, default=11)
+    e.add_argument("--z-list", type=str, default="")
+    args = p.parse_args()
+
+    if args.cmd == "train":
+        box = {"epsilon": args.epsilon, "epsilon_grav": args.epsilon_grav, "sigma8_0": args.sigma8_0}
+        degree = tuple(int(v) for v in args.degree.split(","))
+        if len(degree) != 3:
+            raise SystemExit("--degree needs three values: epsilon,epsilon_grav,z")
+        t0 = time.perf_counter()
+        try:
+            emu = GrowthEmulator.train(
+                box, args.zmax, degree, args.validate,
+                model=args.model, omega_lambda=args.omega_lambda, omega_m=args.omega_m,
+                mu=args.mu, sdef=args.sdef, na=args.na,
+            )
+        except ValueError as exc:
+            raise SystemExit(str(exc))
+        emu.save(args.out)
+        print("train_s", f"{time.perf_counter() - t0:.3f}")
+        for k, v in emu.max_error.items():
+            print(f"max_error_{k}", v)
+        print("out", args.out)
+        return 0
+
+    emu = GrowthEmulator.load(args.path)
+    z = parse_z_grid(args.z_list, args.zmax, args.nz)
+    fs8 = emu.fsigma8(args.epsilon, args.epsilon_grav, args.sigma8_0, z)[0]
+    fallback = emu.n_fallback > 0
+    n_rep = 3 if fallback else 2000
+    t0 = time.perf_counter()
+    for _ in range(n_rep):
+        emu.fsigma8(args.epsilon, args.epsilon_grav, args.sigma8_0, z)
+    us = (time.perf_counter() - t0) / n_rep * 1.0e6
+    print("fallback", fallback)
+    print("max_error_fsigma8", emu.max_error.get("fsigma8"))
+    print("eval_us", f"{us:.1f}")
+    print("")
+    print("z,f_sigma8(z)")
+    for zz, v in zip(z.tolist(), fs8.tolist()):
+        print(f"{zz:.6f},{v:.9f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
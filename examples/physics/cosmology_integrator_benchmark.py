@@ -0,0 +1,80 @@
+import argparse
+import math
+import time
+
+import numpy as np
+
+from cosmology import (
+    compute_s_grid,
+    h0_t0,
+    h0_t0_adaptive,
+    logspace,
+    make_background,
+    solve_growth,
+    solve_growth_adaptive,
+)
+
+
+def main() -> int:
+    # RHS evaluations and accuracy of the fixed-grid integrators against the
+    # adaptive Dormand-Prince path. The reference is fixed RK4 at --na-ref for
+    # growth and adaptive at rtol=1e-13 for H0 t0.
+    p = argparse.ArgumentParser(prog="cosmology_integrator_benchmark")
+    p.add_argument("--epsilon", type=float, default=1.0 / math.e)
+    p.add_argument("--epsilon-grav", type=float, default=0.3)
+    p.add_argument("--na-ref", type=int, default=200001)
+    args = p.parse_args()
+
+    bg = make_background("epsilon", args.epsilon, 0.0, 0.0)
+    a_ref = logspace(1.0e-3, 1.0, args.na_ref)
+    mu_ref = 1.0 - args.epsilon_grav * compute_s_grid(bg, a_ref, "ratio")
+    d_ref, f_ref = solve_growth(bg, a_ref, mu_ref)
+    # Probe at the nodes of the coarsest grid with z <= 3; with na_ref - 1 a
+    # multiple of 200 they are nodes of every fixed grid below as well.
+    stride = (args.na_ref - 1) // 200
+    idx = np.arange(0, args.na_ref, stride)
+    idx = idx[a_ref[idx] >= 0.25]
+    a_probe = a_ref[idx]
+    d_ref = d_ref[idx]
+    f_ref = f_ref[idx]
+
+    print("growth(method,setting,rhs_evals,max_abs_dD,max_abs_df,time_ms)")
+    for na in (201, 2001, 20001):
+        a_grid = logspace(1.0e-3, 1.0, na)
+        mu = 1.0 - args.epsilon_grav * compute_s_grid(bg, a_grid, "ratio")
+        t0 = time.perf_counter()
+        d, f = solve_growth(bg, a_grid, mu)
+        ms = (time.perf_counter() - t0) * 1.0e3
+        sub = idx // ((args.na_ref - 1) // (na - 1))
+        err_d = np.max(np.abs(d[sub] - d_ref))
+        err_f = np.max(np.abs(f[sub] - f_ref))
+        print(f"rk4,na={na},{4 * (na - 1)},{err_d:.3e},{err_f:.3e},{ms:.2f}")
+
+    for rtol in (1.0e-6, 1.0e-8, 1.0e-10):
+        t0 = time.perf_counter()
+        sol = solve_growth_adaptive(bg, a_ref, mu_ref, rtol=rtol)
+        d, f = sol.at(a_probe)
+        ms = (time.perf_counter() - t0) * 1.0e3
+        err_d = np.max(np.abs(d - d_ref))
+        err_f = np.max(np.abs(f - f_ref))
+        print(f"rk45,rtol={rtol:.0e},{sol.n_rhs},{err_d:.3e},{err_f:.3e},{ms:.2f}")
+
+    print("")
+    print("h0_t0(method,setting,rhs_evals,abs_error,time_ms)")
+    ref = h0_t0(bg, 1.0e-6, method="rk45", rtol=1.0e-13)
+    for n in (2001, 20001):
+        t0 = time.perf_counter()
+        val = h0_t0(bg, 1.0e-6, n=n)
+        ms = (time.perf_counter() - t0) * 1.0e3
+        print(f"simpson,n={n},{n},{abs(val - ref):.3e},{ms:.2f}")
+    for rtol in (1.0e-8, 1.0e-10):
+        t0 = time.perf_counter()
+        sol = h0_t0_adaptive(bg, 1.0e-6, rtol=rtol)
+        ms = (time.perf_counter() - t0) * 1.0e3
+        val = float(sol.y[-1, 0])
+        print(f"rk45,rtol={rtol:.0e},{sol.n_rhs},{abs(val - ref):.3e},{ms:.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,298 @@
+import argparse
+import math
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+import numpy as np
+
+from cosmology import (
+    Background,
+    compute_s_grid,
+    cubic_stencil,
+    logspace,
+    make_background,
+    solve_growth_batch,
+)
+
+
+PARAMS = ("epsilon", "epsilon_grav", "sigma8_0")
+
+
+class FSigma8Data:
+    def __init__(self, z: np.ndarray, value: np.ndarray, cov: np.ndarray):
+        self.z = np.asarray(z, dtype=float)
+        self.value = np.asarray(value, dtype=float)
+        cov = np.asarray(cov, dtype=float)
+        if cov.ndim == 1:
+            cov = np.diag(cov * cov)
+        if self.z.shape != self.value.shape or cov.shape != (len(self.z), len(self.z)):
+            raise ValueError("z, value and covariance shapes do not match")
+        if np.any(self.z < 0.0):
+            raise ValueError("redshifts must be >= 0")
+        self.cov = cov
+        self.inv_cov = np.linalg.inv(cov)
+
+    @classmethod
+    def from_csv(cls, path: str) -> "FSigma8Data":
+        # Columns z,fsigma8,sigma (header optional).
+        table = np.loadtxt(path, delimiter=",", ndmin=2, comments="#",
+                           skiprows=_header_rows(path))
+        if table.shape[1] < 3:
+            raise ValueError("expected columns z,fsigma8,sigma")
+        return cls(table[:, 0], table[:, 1], table[:, 2])
+
+
+def _header_rows(path: str) -> int:
+    with open(path) as fh:
+        first = fh.readline().split(",")[0].strip()
+    try:
+        float(first)
+    except ValueError:
+        return 1
+    return 0
+
+
+class FSigma8Likelihood:
+    """chi^2 of an f*sigma8(z) dataset, kept in-process between calls.
+
+    fsigma8 = sigma8_0 * f(z) D(z), so only (epsilon, epsilon_grav) need a
+    growth solve; f*D at the data redshifts is cached per pair and sigma8_0
+    is applied afterwards. S(a) is cached per epsilon. Batched evaluations
+    solve all uncached pairs with one solve_growth_batch call. f*D is read
+    off the growth grid with fixed four-point stencils; at the default
+    na=257 this agrees with an na=20001 solve to ~5e-6 in fsigma8.
+    """
+
+    def __init__(
+        self,
+        data: FSigma8Data,
+        free: tuple[str, ...] = PARAMS,
+        fixed: Optional[dict[str, float]] = None,
+        bounds: Optional[dict[str, tuple[float, float]]] = None,
+        model: str = "epsilon",
+        omega_lambda: float = 0.685,
+        omega_m: float = 0.315,
+        mu: str = "sfe",
+        sdef: str = "ratio",
+        na: int = 257,
+        cache_size: int = 65536,
+    ):
+        unknown = [p for p in free if p not in PARAMS]
+        if unknown:
+            raise ValueError(f"unknown parameters: {', '.join(unknown)}")
+        self.data = data
+        self.free = tuple(free)
+        self.fixed = {"epsilon": 1.0 / math.e, "epsilon_grav": 0.0, "sigma8_0": 0.811}
+        self.fixed.update(fixed or {})
+        self.bounds = dict(bounds or {})
+        self.model = model
+        self.omega_lambda = omega_lambda
+        self.omega_m = omega_m
+        self.mu = mu
+        self.sdef = sdef
+        self.a_grid = logspace(1.0e-3, 1.0, na)
+        self.ln_a = np.log(self.a_grid)
+        self._lookup_idx, self._lookup_w = cubic_stencil(self.ln_a, -np.log1p(data.z))
+        self.cache_size = cache_size
+        self._s_cache: OrderedDict = OrderedDict()
+        self._fd_cache: OrderedDict = OrderedDict()
+        self.n_evals = 0
+        self.n_solves = 0
+
+    def full_params(self, theta: np.ndarray) -> np.ndarray:
+        # [m, len(free)] -> [m, 3] in PARAMS order.
+        theta = np.atleast_2d(np.asarray(theta, dtype=float))
+        out = np.empty((theta.shape[0], len(PARAMS)))
+        for k, name in enumerate(PARAMS):
+            if name in self.free:
+                out[:, k] = theta[:, self.free.index(name)]
+            else:
+                out[:, k] = self.fixed[name]
+        return out
+
+    def _background(self, eps: float) -> Background:
+        return make_background(self.model, eps, self.omega_lambda, self.omega_m)
+
+    def _s_grid(self, eps: float) -> np.ndarray:
+        key = eps if self.model == "epsilon" else 0.0
+        s = self._s_cache.get(key)
+        if s is None:
+            s = compute_s_grid(self._background(eps), self.a_grid, self.sdef)
+            self._remember(self._s_cache, key, s)
+        return s
+
+    def _remember(self, cache: OrderedDict, key, value) -> None:
+        cache[key] = value
+        if len(cache) > self.cache_size:
+            cache.popitem(last=False)
+
+    def growth_at_data(self, eps: np.ndarray, eg: np.ndarray) -> np.ndarray:
+        # f(z) D(z) at the data redshifts, [m, n_data].
+        eps = np.atleast_1d(np.asarray(eps, dtype=float))
+        eg = np.atleast_1d(np.asarray(eg, dtype=float))
+        if self.model != "epsilon":
+            eps = np.zeros_like(eps)
+        if self.mu == "lcdm":
+            eg = np.zeros_like(eg)
+        out = np.empty((len(eps), len(self.data.z)))
+        missing: dict[tuple[float, float], list[int]] = {}
+        for i, key in enumerate(zip(eps.tolist(), eg.tolist())):
+            hit = self._fd_cache.get(key)
+            if hit is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                self._fd_cache.move_to_end(key)
+                out[i] = hit
+        if not missing:
+            return out
+
+        keys = list(missing)
+        k_eps = np.array([k[0] for k in keys])
+        k_eg = np.array([k[1] for k in keys])
+        bgs = [self._background(e) for e in k_eps]
+        bg = Background(
+            omega_m0=np.array([b.omega_m0 for b in bgs])[:, None],
+            omega_l0=np.array([b.omega_l0 for b in bgs])[:, None],
+        )
+        s_rows = np.stack([self._s_grid(e) for e in k_eps])
+        mu_rows = 1.0 - k_eg[:, None] * s_rows
+        d_norm, f_ln = solve_growth_batch(bg, self.a_grid, mu_rows)
+        self.n_solves += len(keys)
+        fd = f_ln * d_norm
+        vals = np.einsum("mjk,jk->mj", fd[:, self._lookup_idx], self._lookup_w)
+        for key, val in zip(keys, vals):
+            self._remember(self._fd_cache, key, val)
+            out[missing[key]] = val
+        return out
+
+    def fsigma8(self, theta: np.ndarray) -> np.ndarray:
+        p = self.full_params(theta)
+        return p[:, 2, None] * self.growth_at_data(p[:, 0], p[:, 1])
+
+    def chi2(self, theta: np.ndarray) -> np.ndarray:
+        resid = self.fsigma8(theta) - self.data.value
+        self.n_evals += resid.shape[0]
+        out = np.einsum("ij,jk,ik->i", resid, self.data.inv_cov, resid)
+        return out if np.ndim(theta) > 1 else float(out[0])
+
+    def log_prob(self, theta: np.ndarray) -> np.ndarray:
+        theta2 = np.atleast_2d(np.asarray(theta, dtype=float))
+        lp = np.zeros(theta2.shape[0])
+        for k, name in enumerate(self.free):
+            lo, hi = self.bounds.get(name, (-np.inf, np.inf))
+            lp[(theta2[:, k] < lo) | (theta2[:, k] > hi)] = -np.inf
+        ok = np.isfinite(lp)
+        if np.any(ok):
+            lp[ok] = -0.5 * self.chi2(theta2[ok])
+        return lp if np.ndim(theta) > 1 else float(lp[0])
+
+
+def ensemble_sample(
+    log_prob: Callable[[np.ndarray], np.ndarray],
+    p0: np.ndarray,
+    n_steps: int,
+    stretch: float = 2.0,
+    seed: int = 0,
+) -> tuple[np.ndarray, np.ndarray, float]:
+    # Affine-invariant stretch-move ensemble sampler (Goodman & Weare 2010).
+    # Each half of the ensemble is updated against the other half, so the
+    # whole half is proposed and scored with one vectorized log_prob call.
+    rng = np.random.default_rng(seed)
+    walkers = np.array(p0, dtype=float)
+    n_walk, n_dim = walkers.shape
+    if n_walk < 2 * n_dim or n_walk % 2:
+        raise ValueError("need an even number of walkers >= 2 * n_dim")
+    lp = np.asarray(log_prob(walkers), dtype=float)
+    chain = np.empty((n_steps, n_walk, n_dim))
+    lp_chain = np.empty((n_steps, n_walk))
+    half = n_walk // 2
+    halves = (np.arange(half), np.arange(half, n_walk))
+    accepted = 0
+
+    for step in range(n_steps):
+        for s in (0, 1):
+            act = halves[s]
+            other = walkers[halves[1 - s]]
+            zz = ((stretch - 1.0) * rng.random(half) + 1.0) ** 2 / stretch
+            partner = other[rng.integers(0, half, size=half)]
+            prop = partner + zz[:, None] * (walkers[act] - partner)
+            lp_prop = np.asarray(log_prob(prop), dtype=float)
+            log_acc = (n_dim - 1.0) * np.log(zz) + lp_prop - lp[act]
+            take = np.log(rng.random(half)) < log_acc
+            walkers[act[take]] = prop[take]
+            lp[act[take]] = lp_prop[take]
+            accepted += int(take.sum())
+        chain[step] = walkers
+        lp_chain[step] = lp
+
+    return chain, lp_chain, accepted / float(n_steps * n_walk)
+
+
+def main() -> int:
+    p = argparse.ArgumentParser(prog="cosmology_likelihood")
+    p.add_argument("--data", type=str, required=True)
+    p.add_argument("--free", type=str, default="epsilon_grav,sigma8_0")
+    p.add_argument("--model", choices=["epsilon", "calibrate"], default="epsilon")
+    p.add_argument("--epsilon", type=float, default=1.0 / math.e)
+    p.add_argument("--omega-lambda", type=float, default=0.685)
+    p.add_argument("--omega-m", type=float, default=0.315)
+    p.add_argument("--mu", choices=["lcdm", "sfe"], default="sfe")
+    p.add_argument("--sdef", choices=["ratio", "cumulative"], default="ratio")
+    p.add_argument("--epsilon-grav", type=float, default=0.0)
+    p.add_argument("--sigma8-0", type=float, default=0.811)
+    p.add_argument("--na", type=int, default=257)
+    p.add_argument("--walkers", type=int, default=64)
+    p.add_argument("--steps", type=int, default=2000)
+    p.add_argument("--burn", type=int, default=500)
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    free = tuple(x.strip().replace("-", "_") for x in args.free.split(",") if x.strip())
+    start = {"epsilon": args.epsilon, "epsilon_grav": args.epsilon_grav, "sigma8_0": args.sigma8_0}
+    bounds = {"epsilon": (-0.99, 0.99), "epsilon_grav": (-5.0, 5.0), "sigma8_0": (0.0, 2.0)}
+    try:
+        data = FSigma8Data.from_csv(args.data)
+        like = FSigma8Likelihood(
+            data,
+            free=free,
+            fixed=start,
+            bounds=bounds,
+            model=args.model,
+            omega_lambda=args.omega_lambda,
+            omega_m=args.omega_m,
+            mu=args.mu,
+            sdef=args.sdef,
+            na=args.na,
+        )
+    except ValueError as exc:
+        raise SystemExit(str(exc))
+
+    theta0 = np.array([start[name] for name in free])
+    rng = np.random.default_rng(args.seed)
+    p0 = theta0 + 1.0e-3 * rng.standard_normal((args.walkers, len(free)))
+
+    print("data_points", len(data.z))
+    print("free", ",".join(free))
+    print("chi2_start", f"{like.chi2(theta0):.6f}")
+
+    t0 = time.perf_counter()
+    chain, lp_chain, acc = ensemble_sample(like.log_prob, p0, args.steps, seed=args.seed)
+    elapsed = time.perf_counter() - t0
+
+    flat = chain[args.burn :].reshape(-1, len(free))
+    best = np.unravel_index(np.argmax(lp_chain), lp_chain.shape)
+    print("acceptance", f"{acc:.4f}")
+    print("evaluations", like.n_evals)
+    print("growth_solves", like.n_solves)
+    print("evals_per_s", f"{like.n_evals / elapsed:.1f}")
+    print("chi2_best", f"{-2.0 * lp_chain[best]:.6f}")
+    print("")
+    print("param,best,mean,std")
+    for k, name in enumerate(free):
+        print(f"{name},{chain[best][k]:.6f},{flat[:, k].mean():.6f},{flat[:, k].std():.6f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
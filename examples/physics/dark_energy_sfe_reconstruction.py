@@ -1,5 +1,11 @@
+import argparse
+from functools import partial
+
 import numpy as np
 
+from sfe_denoise import iterative_sfe_denoise
+from sfe_sweep import best_point, denoise_sweep_eval, run_sweep
+
 
 def hubble_flat(a: np.ndarray, h0: float, omega_m: float, omega_lambda: float) -> np.ndarray:
     return h0 * np.sqrt(omega_m * a ** (-3.0) + omega_lambda)
@@ -10,37 +16,6 @@ def add_noise(values: np.ndarray, noise_level: float, seed: int) -> np.ndarray:
     return values + noise_level * rng.standard_normal(values.shape)
 
 
-def compute_curvature(values: np.ndarray) -> np.ndarray:
-    n = values.shape[0]
-    curv = np.zeros(n)
-    for i in range(1, n - 1):
-        curv[i] = values[i - 1] - 2 * values[i] + values[i + 1]
-    curv[0] = curv[1]
-    curv[-1] = curv[-2]
-    return curv
-
-
-def sfe_curvature_denoise(values: np.ndarray, alpha: float) -> np.ndarray:
-    curv = compute_curvature(values)
-    curv_abs = np.abs(curv)
-    threshold = np.percentile(curv_abs, 75)
-    high_curv_mask = curv_abs > threshold
-    
-    result = values.copy()
-    for i in range(1, len(values) - 1):
-        if high_curv_mask[i]:
-            neighbor_avg = 0.5 * (values[i - 1] + values[i + 1])
-            result[i] = (1 - alpha) * values[i] + alpha * neighbor_avg
-    return result
-
-
-def iterative_sfe_denoise(values: np.ndarray, alpha: float, iterations: int) -> np.ndarray:
-    result = values.copy()
-    for _ in range(iterations):
-        result = sfe_curvature_denoise(result, alpha)
-    return result
-
-
 def rms_error(a: np.ndarray, b: np.ndarray) -> float:
     diff = a - b
     return float(np.sqrt(np.mean(diff * diff)))
@@ -77,7 +52,7 @@ def run_experiment():
     print(f"improvement_factor: {ratio:.4f}")
 
 
-def sweep_params():
+def sweep_params(n_jobs: int = 1):
     n = 256
     a = np.linspace(0.1, 1.0, n)
     h0 = 1.0
@@ -99,14 +74,17 @@ def sweep_params():
     best_iters = 1
     best_rms = base_rms
     
-    for alpha in alphas:
-        for iters in iters_list:
-            h_sfe = iterative_sfe_denoise(noisy, alpha, iters)
-            curr_rms = rms_error(h_sfe, h_true)
-            if curr_rms < best_rms:
-                best_rms = curr_rms
-                best_alpha = alpha
-                best_iters = iters
+    table = run_sweep(
+        partial(denoise_sweep_eval, error_fn=rms_error),
+        {"alpha": alphas},
+        {"values": noisy, "reference": h_true, "checkpoints": np.array(iters_list)},
+        n_jobs=n_jobs,
+    )
+    best = best_point(table)
+    if best["error"] < best_rms:
+        best_rms = best["error"]
+        best_alpha = best["alpha"]
+        best_iters = best["iterations"]
 
     best_ratio = base_rms / best_rms if best_rms > 0.0 else np.inf
     
@@ -120,5 +98,8 @@ def sweep_params():
 
 
 if __name__ == "__main__":
+    p = argparse.ArgumentParser(prog="dark_energy_sfe_reconstruction")
+    p.add_argument("--n-jobs", type=int, default=-1, help="sweep worker processes (-1: all cores)")
+    args = p.parse_args()
     run_experiment()
-    sweep_params()
+    sweep_params(n_jobs=args.n_jobs)
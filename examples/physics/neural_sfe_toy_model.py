@@ -1,5 +1,10 @@
+import argparse
+from functools import partial
+
 import numpy as np
 
+from sfe_sweep import best_point, run_sweep
+
 
 def target_trajectory(n_steps: int) -> np.ndarray:
     t = np.linspace(0.0, 1.0, n_steps)
@@ -39,6 +44,16 @@ def rms_error(a: np.ndarray, b: np.ndarray) -> float:
     return float(np.sqrt(np.mean(diff * diff)))
 
 
+def _tau_sweep_eval(points, noisy_traj, true_traj, lam):
+    error_traj = noisy_traj - true_traj
+    results = []
+    for p in points:
+        smooth_error = sfe_smooth_1d(error_traj, lam, p["tau"])
+        sfe_traj = noisy_traj - smooth_error
+        results.append(rms_error(sfe_traj, true_traj))
+    return results
+
+
 def run_experiment():
     n_steps = 300
     small_noise = 0.05
@@ -70,7 +85,7 @@ def run_experiment():
     print("improvement_factor", ratio)
 
 
-def sweep_tau():
+def sweep_tau(n_jobs: int = 1):
     n_steps = 300
     small_noise = 0.05
     spike_amp = 1.0
@@ -86,14 +101,16 @@ def sweep_tau():
     taus = np.linspace(0.0, 2.0, 41)
     best_tau = 0.0
     best_rms = base_rms
-    for tau in taus:
-        error_traj = noisy_traj - true_traj
-        smooth_error = sfe_smooth_1d(error_traj, lam, tau)
-        sfe_traj = noisy_traj - smooth_error
-        curr_rms = rms_error(sfe_traj, true_traj)
-        if curr_rms < best_rms:
-            best_rms = curr_rms
-            best_tau = tau
+    table = run_sweep(
+        partial(_tau_sweep_eval, lam=lam),
+        {"tau": taus},
+        {"noisy_traj": noisy_traj, "true_traj": true_traj},
+        n_jobs=n_jobs,
+    )
+    best = best_point(table)
+    if best["error"] < best_rms:
+        best_rms = best["error"]
+        best_tau = best["tau"]
 
     best_ratio = base_rms / best_rms if best_rms > 0.0 else np.inf
     print("sweep_tau_neural")
@@ -105,7 +122,10 @@ def sweep_tau():
 
 
 if __name__ == "__main__":
+    p = argparse.ArgumentParser(prog="neural_sfe_toy_model")
+    p.add_argument("--n-jobs", type=int, default=-1, help="sweep worker processes (-1: all cores)")
+    args = p.parse_args()
     run_experiment()
-    sweep_tau()
+    sweep_tau(n_jobs=args.n_jobs)
 
 
@@ -1,5 +1,11 @@
+import argparse
+from functools import partial
+
 import numpy as np
 
+from sfe_denoise import iterative_sfe_denoise
+from sfe_sweep import best_point, denoise_sweep_eval, run_sweep
+
 
 def true_folding_path(n_steps: int) -> np.ndarray:
     t = np.linspace(0.0, 1.0, n_steps)
@@ -11,37 +17,6 @@ def add_noise(path: np.ndarray, noise_level: float, seed: int) -> np.ndarray:
     return path + noise_level * rng.standard_normal(path.shape)
 
 
-def compute_curvature(values: np.ndarray) -> np.ndarray:
-    n = values.shape[0]
-    curv = np.zeros(n)
-    for i in range(1, n - 1):
-        curv[i] = values[i - 1] - 2 * values[i] + values[i + 1]
-    curv[0] = curv[1]
-    curv[-1] = curv[-2]
-    return curv
-
-
-def sfe_curvature_denoise(values: np.ndarray, alpha: float) -> np.ndarray:
-    curv = compute_curvature(values)
-    curv_abs = np.abs(curv)
-    threshold = np.percentile(curv_abs, 75)
-    high_curv_mask = curv_abs > threshold
-    
-    result = values.copy()
-    for i in range(1, len(values) - 1):
-        if high_curv_mask[i]:
-            neighbor_avg = 0.5 * (values[i - 1] + values[i + 1])
-            result[i] = (1 - alpha) * values[i] + alpha * neighbor_avg
-    return result
-
-
-def iterative_sfe_denoise(values: np.ndarray, alpha: float, iterations: int) -> np.ndarray:
-    result = values.copy()
-    for _ in range(iterations):
-        result = sfe_curvature_denoise(result, alpha)
-    return result
-
-
 def rmsd(a: np.ndarray, b: np.ndarray) -> float:
     diff = a - b
     return float(np.sqrt(np.mean(diff * diff)))
@@ -73,7 +48,7 @@ def run_experiment():
     print(f"improvement_factor: {ratio:.4f}")
 
 
-def sweep_params():
+def sweep_params(n_jobs: int = 1):
     n_steps = 200
     noise_level = 0.05
     seed = 2025
@@ -90,14 +65,17 @@ def sweep_params():
     best_iters = 1
     best_rmsd = base_rmsd
     
-    for alpha in alphas:
-        for iters in iters_list:
-            denoised_path = iterative_sfe_denoise(noisy_path, alpha, iters)
-            curr_rmsd = rmsd(denoised_path, true_path)
-            if curr_rmsd < best_rmsd:
-                best_rmsd = curr_rmsd
-                best_alpha = alpha
-                best_iters = iters
+    table = run_sweep(
+        partial(denoise_sweep_eval, error_fn=rmsd),
+        {"alpha": alphas},
+        {"values": noisy_path, "reference": true_path, "checkpoints": np.array(iters_list)},
+        n_jobs=n_jobs,
+    )
+    best = best_point(table)
+    if best["error"] < best_rmsd:
+        best_rmsd = best["error"]
+        best_alpha = best["alpha"]
+        best_iters = best["iterations"]
 
     best_ratio = base_rmsd / best_rmsd if best_rmsd > 0.0 else np.inf
     
@@ -111,5 +89,8 @@ def sweep_params():
 
 
 if __name__ == "__main__":
+    p = argparse.ArgumentParser(prog="protein_folding_path_sfe_verification")
+    p.add_argument("--n-jobs", type=int, default=-1, help="sweep worker processes (-1: all cores)")
+    args = p.parse_args()
     run_experiment()
-    sweep_params()
+    sweep_params(n_jobs=args.n_jobs)
@@ -1,5 +1,10 @@
+import argparse
+from functools import partial
+
 import numpy as np
 
+from sfe_sweep import best_point, run_sweep
+
 
 def true_zeros():
     return np.array(
@@ -44,6 +49,10 @@ def rms_error(errors):
     return float(np.sqrt(np.mean(errors * errors)))
 
 
+def _tau_sweep_eval(points, base_err_vec, lam):
+    return [rms_error(sfe_smooth_1d(base_err_vec, lam, p["tau"])) for p in points]
+
+
 def run_experiment():
     base = true_zeros()
     noise_level = 0.02
@@ -63,7 +72,7 @@ def run_experiment():
     print("improvement_factor", ratio)
 
 
-def sweep_tau():
+def sweep_tau(n_jobs=1):
     base = true_zeros()
     noise_level = 0.02
     seed = 123
@@ -76,12 +85,13 @@ def sweep_tau():
     taus = np.linspace(0.0, 2.0, 41)
     best_tau = 0.0
     best_rms = base_rms
-    for tau in taus:
-        sfe_err_vec = sfe_smooth_1d(base_err_vec, lam, tau)
-        rms = rms_error(sfe_err_vec)
-        if rms < best_rms:
-            best_rms = rms
-            best_tau = tau
+    table = run_sweep(
+        partial(_tau_sweep_eval, lam=lam), {"tau": taus}, {"base_err_vec": base_err_vec}, n_jobs=n_jobs
+    )
+    best = best_point(table)
+    if best["error"] < best_rms:
+        best_rms = best["error"]
+        best_tau = best["tau"]
 
     best_ratio = base_rms / best_rms if best_rms > 0.0 else np.inf
     print("sweep_tau_riemann")
@@ -93,7 +103,10 @@ def sweep_tau():
 
 
 if __name__ == "__main__":
+    p = argparse.ArgumentParser(prog="riemann_zeta_sfe_verification")
+    p.add_argument("--n-jobs", type=int, default=-1, help="sweep worker processes (-1: all cores)")
+    args = p.parse_args()
     run_experiment()
-    sweep_tau()
+    sweep_tau(n_jobs=args.n_jobs)
 
 
@@ -0,0 +1,164 @@
+from typing import Callable, Optional, Sequence, Union
+
+import numpy as np
+
+ArrayLike = Union[float, np.ndarray]
+
+
+def compute_curvature(values: np.ndarray) -> np.ndarray:
+    # Second difference along the last axis; the end points copy their
+    # neighbours. values is [n_points] or [n_signals, n_points].
+    values = np.asarray(values)
+    curv = np.zeros(values.shape)
+    curv[..., 1:-1] = values[..., :-2] - 2 * values[..., 1:-1] + values[..., 2:]
+    curv[..., 0] = curv[..., 1]
+    curv[..., -1] = curv[..., -2]
+    return curv
+
+
+def sfe_curvature_denoise(values: np.ndarray, alpha: ArrayLike) -> np.ndarray:
+    # Blend interior points whose |curvature| exceeds the per-signal 75th
+    # percentile toward their neighbour average. alpha is a scalar or one
+    # value per signal.
+    values = np.asarray(values)
+    alpha = np.asarray(alpha, dtype=float)
+    if alpha.ndim:
+        alpha = alpha.reshape(alpha.shape + (1,))
+    curv_abs = np.abs(compute_curvature(values))
+    threshold = np.percentile(curv_abs, 75, axis=-1, keepdims=True)
+    high_curv_mask = curv_abs[..., 1:-1] > threshold
+
+    result = values.copy()
+    neighbor_avg = 0.5 * (values[..., :-2] + values[..., 2:])
+    blended = (1 - alpha) * values[..., 1:-1] + alpha * neighbor_avg
+    result[..., 1:-1] = np.where(high_curv_mask, blended, values[..., 1:-1])
+    return result
+
+
+def iterative_sfe_denoise(values: np.ndarray, alpha: ArrayLike, iterations: int) -> np.ndarray:
+    result = np.array(values, copy=True)
+    for _ in range(iterations):
+        result = sfe_curvature_denoise(result, alpha)
+    return result
+
+
+def _neighbour_sum(field: np.ndarray, periodic: bool, lead: int = 0) -> np.ndarray:
+    # Sum of the 2*ndim axis neighbours of every point. field is
+    # [*batch, *spatial, n_components] with `lead` batch axes; without
+    # periodic wrap only the interior block is returned.
+    n_spatial = field.ndim - 1 - lead
+    total = None
+    for axis in range(lead, lead + n_spatial):
+        if periodic:
+            lo = np.roll(field, 1, axis=axis)
+            hi = np.roll(field, -1, axis=axis)
+        else:
+            lo_idx = list(_interior(n_spatial, lead))
+            hi_idx = list(lo_idx)
+            lo_idx[axis] = slice(None, -2)
+            hi_idx[axis] = slice(2, None)
+            lo = field[tuple(lo_idx)]
+            hi = field[tuple(hi_idx)]
+        total = lo + hi if total is None else total + lo + hi
+    return total
+
+
+def _interior(n_spatial: int, lead: int = 0) -> tuple:
+    return tuple([slice(None)] * lead + [slice(1, -1)] * n_spatial + [slice(None)])
+
+
+def compute_laplacian(field: np.ndarray, periodic: bool = False) -> np.ndarray:
+    # Discrete Laplacian of an N-D vector field [*spatial, n_components].
+    # Without periodic wrap the boundary layer is left at zero.
+    field = np.asarray(field)
+    n_spatial = field.ndim - 1
+    lap = _neighbour_sum(field, periodic) - 2 * n_spatial * (
+        field if periodic else field[_interior(n_spatial)]
+    )
+    if periodic:
+        return lap
+    curv = np.zeros_like(field)
+    curv[_interior(n_spatial)] = lap
+    return curv
+
+
+def sfe_stencil_denoise(
+    field: np.ndarray, alpha: ArrayLike, periodic: bool = False, batched: bool = False
+) -> np.ndarray:
+    # N-D counterpart of sfe_curvature_denoise: points whose Laplacian
+    # magnitude exceeds the 75th percentile are blended toward the mean of
+    # their 2*ndim neighbours. With batched=True the leading axis indexes
+    # independent fields (each with its own threshold and alpha).
+    field = np.asarray(field)
+    lead = 1 if batched else 0
+    n_spatial = field.ndim - 1 - lead
+    alpha = np.asarray(alpha, dtype=float)
+    if alpha.ndim:
+        alpha = alpha.reshape(alpha.shape + (1,) * (n_spatial + 1))
+    core = field if periodic else field[_interior(n_spatial, lead)]
+    nsum = _neighbour_sum(field, periodic, lead)
+    lap = nsum - 2 * n_spatial * core
+
+    curv_mag = np.sqrt(np.sum(lap ** 2, axis=-1))
+    if not periodic:
+        # The zero boundary layer still counts toward the percentile
+        full = np.zeros(field.shape[:-1])
+        full[_interior(n_spatial, lead)[:-1]] = curv_mag
+        curv_full = full
+    else:
+        curv_full = curv_mag
+    flat = curv_full.reshape(curv_full.shape[:lead] + (-1,))
+    threshold = np.percentile(flat, 75, axis=-1)
+    threshold = np.reshape(threshold, np.shape(threshold) + (1,) * n_spatial)
+    high_curv_mask = (curv_mag > threshold)[..., None]
+
+    neighbor_avg = (1.0 / (2 * n_spatial)) * nsum
+    blended = np.where(high_curv_mask, (1 - alpha) * core + alpha * neighbor_avg, core)
+    if periodic:
+        return blended
+    result = field.copy()
+    result[_interior(n_spatial, lead)] = blended
+    return result
+
+
+def iterative_sfe_stencil_denoise(
+    field: np.ndarray, alpha: ArrayLike, iterations: int, periodic: bool = False
+) -> np.ndarray:
+    result = np.array(field, copy=True)
+    for _ in range(iterations):
+        result = sfe_stencil_denoise(result, alpha, periodic)
+    return result
+
+
+def sweep_denoise(
+    values: np.ndarray,
+    reference: np.ndarray,
+    alphas: Sequence[float],
+    checkpoints: Sequence[int],
+    error_fn: Callable[[np.ndarray, np.ndarray], float],
+    step: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None,
+) -> np.ndarray:
+    # Error table [n_alphas, n_checkpoints] for an alpha x iterations sweep.
+    # One copy of `values` per alpha is stacked and advanced together, so
+    # each alpha runs max(checkpoints) passes in total instead of
+    # sum(checkpoints); errors are recorded as each checkpoint is reached.
+    # `step(stacked, alphas)` performs one pass (default: the 1-D
+    # denoiser); entry [a, c] equals
+    # error_fn(iterative_denoise(values, alphas[a], checkpoints[c]), reference).
+    checkpoints = [int(c) for c in checkpoints]
+    if any(c < 0 for c in checkpoints) or any(b <= a for a, b in zip(checkpoints, checkpoints[1:])):
+        raise ValueError("checkpoints must be non-negative and strictly increasing")
+    if step is None:
+        step = sfe_curvature_denoise
+    alphas = np.asarray(alphas, dtype=float)
+    values = np.asarray(values)
+    stacked = np.repeat(values[None], len(alphas), axis=0)
+    errors = np.empty((len(alphas), len(checkpoints)))
+    done = 0
+    for col, target in enumerate(checkpoints):
+        for _ in range(target - done):
+            stacked = step(stacked, alphas)
+        done = target
+        for row in range(len(alphas)):
+            errors[row, col] = error_fn(stacked[row], reference)
+    return errors
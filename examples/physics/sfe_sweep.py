@@ -0,0 +1,211 @@
+import argparse
+import itertools
+import os
+import sys
+import time
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Callable, Dict, Iterator, List, Mapping, Optional, Sequence, Union
+
+import numpy as np
+
+from sfe_denoise import sweep_denoise
+
+# Parameter sweeps for the physics examples. run_sweep evaluates a grid
+# serially or in a joblib process pool; the large inputs are placed in
+# shared memory once and every worker maps them read-only, instead of
+# pickling them into each task.
+#
+# evaluate(points, **arrays) receives a chunk of grid points (list of
+# parameter dicts) and returns one item per point: a float (stored as the
+# "error" column), a dict of metrics, or a list of metric dicts (one table
+# row each, e.g. per iteration checkpoint).
+
+Grid = Union[Mapping[str, Sequence[Any]], Sequence[Dict[str, Any]]]
+
+# Worker-side cache of attached segments, keyed by segment name
+_ATTACHED: Dict[str, shared_memory.SharedMemory] = {}
+
+
+def grid_points(grid: Grid) -> List[Dict[str, Any]]:
+    # Cartesian product in the order given (first key outermost), or an
+    # explicit list of parameter dicts.
+    if isinstance(grid, Mapping):
+        keys = list(grid)
+        return [dict(zip(keys, combo)) for combo in itertools.product(*grid.values())]
+    return [dict(p) for p in grid]
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    # The creating process owns the segment; workers must not let their
+    # resource tracker unlink it when they exit.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 has no track flag: drop the registration made on attach
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _views(specs: Mapping[str, tuple]) -> Dict[str, np.ndarray]:
+    names = {spec[0] for spec in specs.values()}
+    for stale in [n for n in _ATTACHED if n not in names]:
+        _ATTACHED.pop(stale).close()
+    views = {}
+    for key, (name, shape, dtype) in specs.items():
+        if name not in _ATTACHED:
+            _ATTACHED[name] = _attach(name)
+        arr = np.ndarray(shape, dtype=dtype, buffer=_ATTACHED[name].buf)
+        arr.flags.writeable = False
+        views[key] = arr
+    return views
+
+
+@contextmanager
+def shared_arrays(arrays: Mapping[str, np.ndarray]) -> Iterator[Dict[str, tuple]]:
+    # Copy arrays into shared memory once; yields picklable
+    # (name, shape, dtype) specs and unlinks the segments on exit.
+    segments = []
+    specs = {}
+    try:
+        for key, arr in arrays.items():
+            arr = np.ascontiguousarray(arr)
+            shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+            segments.append(shm)
+            np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+            specs[key] = (shm.name, arr.shape, arr.dtype.str)
+        yield specs
+    finally:
+        for shm in segments:
+            shm.close()
+            if sys.version_info < (3, 13):
+                # Workers sharing this tracker dropped the registration on
+                # attach; restore it so unlink() unregisters exactly once.
+                resource_tracker.register(shm._name, "shared_memory")
+            shm.unlink()
+
+
+def _run_chunk(evaluate: Callable, points: List[Dict[str, Any]], specs: Mapping[str, tuple]) -> list:
+    return list(evaluate(points, **_views(specs)))
+
+
+def _table(points: List[Dict[str, Any]], results: Sequence[Any]) -> np.ndarray:
+    rows = []
+    for params, res in zip(points, results):
+        if isinstance(res, Mapping):
+            res = [res]
+        elif not isinstance(res, (list, tuple)):
+            res = [{"error": res}]
+        rows.extend({**params, **metrics} for metrics in res)
+    names = list(rows[0])
+    dtype = [(name, np.asarray([r[name] for r in rows]).dtype) for name in names]
+    return np.array([tuple(r[name] for name in names) for r in rows], dtype=dtype)
+
+
+def run_sweep(
+    evaluate: Callable[..., Sequence[Any]],
+    grid: Grid,
+    arrays: Optional[Mapping[str, np.ndarray]] = None,
+    n_jobs: int = 1,
+    n_chunks: Optional[int] = None,
+) -> np.ndarray:
+    # Tidy result table (structured array): one row per grid point (or per
+    # metric dict), parameter columns first, in grid order. n_jobs=-1 uses
+    # every core. With a single worker everything runs in-process as one
+    # chunk; otherwise contiguous chunks (default four per worker) go to a
+    # joblib pool, so evaluate must be picklable.
+    points = grid_points(grid)
+    arrays = dict(arrays or {})
+    workers = (os.cpu_count() or 1) if n_jobs < 0 else n_jobs
+    if workers == 1 or len(points) <= 1:
+        return _table(points, list(evaluate(points, **arrays)))
+
+    from joblib import Parallel, delayed
+
+    n_chunks = min(len(points), n_chunks or 4 * workers)
+    bounds = np.linspace(0, len(points), n_chunks + 1).astype(int)
+    chunks = [points[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+    with shared_arrays(arrays) as specs:
+        parts = Parallel(n_jobs=workers)(delayed(_run_chunk)(evaluate, c, specs) for c in chunks)
+    return _table(points, [res for part in parts for res in part])
+
+
+def best_point(table: np.ndarray, metric: str = "error") -> np.void:
+    # First row with the smallest metric (grid order breaks ties, like a
+    # serial scan keeping strict improvements).
+    return table[int(np.argmin(table[metric]))]
+
+
+def rms_error(a: np.ndarray, b: np.ndarray) -> float:
+    diff = a - b
+    return float(np.sqrt(np.mean(diff * diff)))
+
+
+def denoise_sweep_eval(
+    points: List[Dict[str, Any]],
+    values: np.ndarray,
+    reference: np.ndarray,
+    checkpoints: np.ndarray,
+    error_fn: Callable[[np.ndarray, np.ndarray], float] = rms_error,
+    step: Optional[Callable[[np.ndarray, np.ndarray], np.ndarray]] = None,
+) -> list:
+    # Evaluator for alpha x iterations denoise sweeps: the alphas of a chunk
+    # are stacked and advanced together by sweep_denoise, one row per
+    # (alpha, iteration checkpoint).
+    checkpoints = [int(c) for c in checkpoints]
+    alphas = [p["alpha"] for p in points]
+    errors = sweep_denoise(values, reference, alphas, checkpoints, error_fn, step)
+    return [
+        [{"iterations": c, "error": e} for c, e in zip(checkpoints, row)]
+        for row in errors
+    ]
+
+
+def main() -> int:
+    # Scaling check for run_sweep on a large 1-D denoise sweep:
+    # wall time, speedup and efficiency per n_jobs, and agreement with the
+    # serial table.
+    p = argparse.ArgumentParser(prog="sfe_sweep")
+    p.add_argument("--n-points", type=int, default=200000)
+    p.add_argument("--n-alphas", type=int, default=64)
+    p.add_argument("--iterations", default="1,2,3,5,10")
+    p.add_argument("--n-jobs", default=None, help="comma list (default 1,2,4,... up to cpu_count)")
+    p.add_argument("--seed", type=int, default=0)
+    args = p.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    reference = np.sin(np.linspace(0.0, 8.0 * np.pi, args.n_points))
+    values = reference + 0.05 * rng.standard_normal(args.n_points)
+    checkpoints = np.array([int(v) for v in args.iterations.split(",") if v])
+    grid = {"alpha": np.linspace(0.05, 0.95, args.n_alphas)}
+    arrays = {"values": values, "reference": reference, "checkpoints": checkpoints}
+
+    if args.n_jobs:
+        jobs = [int(v) for v in args.n_jobs.split(",") if v]
+    else:
+        jobs = [1]
+        while jobs[-1] * 2 <= (os.cpu_count() or 1):
+            jobs.append(jobs[-1] * 2)
+
+    print(f"cpu_count {os.cpu_count()}")
+    print("n_jobs,seconds,speedup,efficiency,matches_serial")
+    ref = base = None
+    for n in jobs:
+        if n != 1:
+            # Start the pool workers outside the timed run
+            run_sweep(denoise_sweep_eval, {"alpha": grid["alpha"][:n]}, arrays, n_jobs=n)
+        t0 = time.perf_counter()
+        table = run_sweep(denoise_sweep_eval, grid, arrays, n_jobs=n)
+        elapsed = time.perf_counter() - t0
+        if ref is None:
+            ref, base = table, elapsed
+        speedup = base / elapsed
+        print(f"{n},{elapsed:.3f},{speedup:.2f},{speedup / n:.2f},{np.array_equal(table, ref)}")
+    best = best_point(ref)
+    print(f"best alpha={best['alpha']:.3f} iterations={best['iterations']} error={best['error']:.6f}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())